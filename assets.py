@@ -0,0 +1,42 @@
+import pygame
+
+# Every sprite and sound of the game is loaded from disk once, the first time it's needed (or all together by
+# preload), and the same surface or sound is handed out after that. Pieces of the same type share one surface, so
+# setting up the board and playing moves never touches the disk.
+
+# Sprite of each piece type, indexed like the Piece type constants
+PIECE_SPRITES = ["white_king", "black_king", "white_queen", "black_queen", "white_rook", "black_rook",
+                 "white_knight", "black_knight", "white_bishop", "black_bishop", "white_pawn", "black_pawn"]
+SPRITES = PIECE_SPRITES + ["open_hand", "closed_hand"]
+SOUNDS = ["Castle", "Check", "EnPassant", "Move1", "Move2", "Move3", "Move4", "No"]
+
+_images = {}
+_sounds = {}
+
+
+def image(name):
+    if name not in _images:
+        surface = pygame.image.load(f"Sprites/{name}.png")
+        # Converting to the display's pixel format makes every blit cheaper, but needs the display to be set up
+        if pygame.display.get_surface() is not None: surface = surface.convert_alpha()
+        _images[name] = surface
+    return _images[name]
+
+
+def piece_image(p_type):
+    return image(PIECE_SPRITES[p_type])
+
+
+def sound(name):
+    if name not in _sounds:
+        _sounds[name] = pygame.mixer.Sound(file=f"Sounds/{name}.wav")
+    return _sounds[name]
+
+
+# Loads everything up front, called once the display has been set up
+def preload():
+    for name in SPRITES:
+        image(name)
+    if pygame.mixer.get_init():
+        for name in SOUNDS:
+            sound(name)
@@ -0,0 +1,814 @@
+# Bitboard representation of a chess position. Every piece type (using the same ids as the Piece class, so type // 2 is
+# the kind of piece and type % 2 is its color) gets one integer whose bit number (row * 8 + col) is set whenever a piece
+# of that type stands on the tile at coords (col, row). Move generation is done with precomputed attack tables, which
+# is a lot cheaper than walking the tiles of the board square by square.
+
+import struct
+
+WHITE = 0
+BLACK = 1
+
+KING = 0
+QUEEN = 1
+ROOK = 2
+KNIGHT = 3
+BISHOP = 4
+PAWN = 5
+
+# Castling rights are stored as a 4 bit mask
+WHITE_OO = 1
+WHITE_OOO = 2
+BLACK_OO = 4
+BLACK_OOO = 8
+
+# Names the pieces are saved under in the States/*.txt files and FEN letters, both indexed by piece type
+STATE_NAMES = ["WK", "BK", "WQ", "BQ", "WR", "BR", "WN", "BN", "WB", "BB", "WP", "BP"]
+FEN_PIECES = "KkQqRrNnBbPp"
+
+# Layout of Position.pack: the occupied squares, one nibble per piece type in square order (a legal position never has
+# more than 32 pieces), then side and castling rights, the en passant square (255 if none), the halfmove clock and ply.
+PACKED_FORMAT = struct.Struct("<Q16sBBHI")
+PACKED_SIZE = PACKED_FORMAT.size # 32 bytes
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+
+
+def square(coords):
+    return coords[1] * 8 + coords[0]
+
+
+def coords(sq):
+    return (sq & 7, sq >> 3)
+
+
+# Yields the square number of every set bit in the bitboard, lowest first
+def squares_of(bb):
+    while bb:
+        low = bb & -bb
+        yield low.bit_length() - 1
+        bb ^= low
+
+
+def popcount(bb):
+    return bin(bb).count("1")
+
+
+# Moves are packed into a single int: bits 0-5 hold the square moved from, bits 6-11 the square moved to and bits 12+
+# the kind of piece a pawn promotes to (0 when the move isn't a promotion, since a pawn can never become a king).
+def encode_move(frm, to, promo=0):
+    return frm | (to << 6) | (promo << 12)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promo(move):
+    return move >> 12
+
+
+def _step_table(steps):
+    table = []
+    for sq in range(64):
+        col, row = coords(sq)
+        bb = 0
+        for d_col, d_row in steps:
+            if 0 <= col + d_col <= 7 and 0 <= row + d_row <= 7:
+                bb |= 1 << square((col + d_col, row + d_row))
+        table.append(bb)
+    return table
+
+
+KING_ATTACKS = _step_table(((1, 0), (0, 1), (1, 1), (1, -1), (-1, 1), (-1, -1), (-1, 0), (0, -1)))
+KNIGHT_ATTACKS = _step_table(((1, 2), (2, 1), (-1, 2), (2, -1), (-2, 1), (1, -2), (-1, -2), (-2, -1)))
+# PAWN_ATTACKS[color][sq] is the set of tiles a pawn of that color standing on sq captures on
+PAWN_ATTACKS = [_step_table(((1, 1), (-1, 1))), _step_table(((1, -1), (-1, -1)))]
+
+ROOK_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BISHOP_DIRECTIONS = ((1, 1), (-1, 1), (1, -1), (-1, -1))
+
+
+# Walks every ray from sq until it leaves the board or hits a piece in occ, the blocking square is included
+def _ray_attacks(sq, directions, occ):
+    col, row = coords(sq)
+    bb = 0
+    for d_col, d_row in directions:
+        tmp_col = col + d_col
+        tmp_row = row + d_row
+        while 0 <= tmp_col <= 7 and 0 <= tmp_row <= 7:
+            bit = 1 << (tmp_row * 8 + tmp_col)
+            bb |= bit
+            if occ & bit: break
+            tmp_col += d_col
+            tmp_row += d_row
+    return bb
+
+
+# The relevant occupancy mask of a slider is every square it can reach on an empty board minus the last square of each
+# ray, since a piece on the edge of the board can't block anything behind it.
+def _slider_mask(sq, directions):
+    col, row = coords(sq)
+    bb = 0
+    for d_col, d_row in directions:
+        tmp_col = col + d_col
+        tmp_row = row + d_row
+        while 0 <= tmp_col + d_col <= 7 and 0 <= tmp_row + d_row <= 7:
+            bb |= 1 << (tmp_row * 8 + tmp_col)
+            tmp_col += d_col
+            tmp_row += d_row
+    return bb
+
+
+# Sliding attacks are looked up the same way magic bitboards do it: the occupancy is masked down to the squares that
+# matter and used as an index into a per-square table. In Python a dict keyed directly on the masked occupancy is
+# faster than the magic multiply-and-shift that would turn it into a dense array index, so that's what is used here.
+def _slider_table(directions):
+    masks = []
+    tables = []
+    for sq in range(64):
+        mask = _slider_mask(sq, directions)
+        table = {}
+        sub = 0
+        while True:
+            table[sub] = _ray_attacks(sq, directions, sub)
+            sub = (sub - mask) & mask
+            if sub == 0: break
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+ROOK_MASKS, ROOK_TABLES = _slider_table(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _slider_table(BISHOP_DIRECTIONS)
+
+
+# BETWEEN[a][b] holds the squares strictly between a and b when they share a rank, file or diagonal, and 0 otherwise
+def _between_table():
+    table = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        col, row = coords(sq)
+        for d_col, d_row in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            bb = 0
+            tmp_col = col + d_col
+            tmp_row = row + d_row
+            while 0 <= tmp_col <= 7 and 0 <= tmp_row <= 7:
+                table[sq][tmp_row * 8 + tmp_col] = bb
+                bb |= 1 << (tmp_row * 8 + tmp_col)
+                tmp_col += d_col
+                tmp_row += d_row
+    return table
+
+
+BETWEEN = _between_table()
+
+
+# Zobrist keys. A position's hash is the xor of the key of every piece on its square, the side key when black is to
+# move, the key of the castling rights and the key of the en passant file. The keys come from a fixed seed so that
+# hashes stay the same between runs and between processes.
+def _zobrist_keys():
+    import random
+    rand = random.Random(20240601)
+    pieces = [[rand.getrandbits(64) for _ in range(64)] for _ in range(12)]
+    side = rand.getrandbits(64)
+    castling = [rand.getrandbits(64) for _ in range(16)]
+    ep = [rand.getrandbits(64) for _ in range(8)]
+    return pieces, side, castling, ep
+
+
+ZOBRIST_PIECES, ZOBRIST_SIDE, ZOBRIST_CASTLING, ZOBRIST_EP = _zobrist_keys()
+
+# Piece-point values of MiniMax.eval_board, indexed by kind of piece
+PIECE_VALUES = [0, 90, 50, 30, 32, 10]
+CENTER = 0x00003C3C3C3C0000 # The center 16 tiles
+
+
+# The material, center and pawn push terms of MiniMax.eval_board only depend on which piece stands on which square, so
+# they are summed up per piece type and square here (from white's point of view) and kept up to date by put and remove
+# the same way the hash is.
+def _piece_square_table():
+    table = []
+    for p_type in range(12):
+        kind = p_type >> 1
+        sign = 1 if p_type & 1 == WHITE else -1
+        row = []
+        for sq in range(64):
+            score = PIECE_VALUES[kind]
+            if CENTER & (1 << sq): score += 2
+            if p_type == PAWN * 2 + WHITE: score += ((sq >> 3) - 1) * 1.5
+            if p_type == PAWN * 2 + BLACK: score += (6 - (sq >> 3)) * 1.5
+            row.append(sign * score)
+        table.append(row)
+    return table
+
+
+PIECE_SQUARE = _piece_square_table()
+
+
+def rook_attacks(sq, occ):
+    return ROOK_TABLES[sq][occ & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq, occ):
+    return BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]]
+
+
+def queen_attacks(sq, occ):
+    return ROOK_TABLES[sq][occ & ROOK_MASKS[sq]] | BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]]
+
+
+# Squares that must be empty and squares that must not be attacked for each castling move, keyed by castling right.
+# The king's own square is part of the safe squares since a king can't castle out of check.
+CASTLING = {
+    WHITE_OO: (4, 6, 7, 5, (1 << 5) | (1 << 6), (1 << 4) | (1 << 5) | (1 << 6)),
+    WHITE_OOO: (4, 2, 0, 3, (1 << 1) | (1 << 2) | (1 << 3), (1 << 2) | (1 << 3) | (1 << 4)),
+    BLACK_OO: (60, 62, 63, 61, (1 << 61) | (1 << 62), (1 << 60) | (1 << 61) | (1 << 62)),
+    BLACK_OOO: (60, 58, 56, 59, (1 << 57) | (1 << 58) | (1 << 59), (1 << 58) | (1 << 59) | (1 << 60)),
+}
+
+# Castling rights that survive a move from or to each square, the rights are lost once the king or rook leaves its
+# starting square or a rook is captured on it.
+CASTLING_KEEP = [WHITE_OO | WHITE_OOO | BLACK_OO | BLACK_OOO] * 64
+CASTLING_KEEP[4] &= ~(WHITE_OO | WHITE_OOO)
+CASTLING_KEEP[7] &= ~WHITE_OO
+CASTLING_KEEP[0] &= ~WHITE_OOO
+CASTLING_KEEP[60] &= ~(BLACK_OO | BLACK_OOO)
+CASTLING_KEEP[63] &= ~BLACK_OO
+CASTLING_KEEP[56] &= ~BLACK_OOO
+
+
+# A chess position that needs nothing but the standard library. __slots__ keeps each instance small, which matters
+# when many of them are kept around by analysis jobs.
+class Position:
+    __slots__ = ("pieces", "occupied", "squares", "side", "castling", "ep", "ply", "halfmove", "history", "hash", "psq")
+
+    def __init__(self):
+        self.pieces = [0] * 12 # One bitboard per piece type
+        self.occupied = [0, 0] # One bitboard per color
+        self.squares = [None] * 64 # Piece type standing on each square, None if empty
+        self.side = WHITE
+        self.castling = 0
+        self.ep = None # Square a pawn of the side to move can capture onto en passant, None if there isn't one
+        self.ply = 0 # Same as Board.turn, the number of moves played so far
+        self.halfmove = 0 # Moves since the last capture or pawn move
+        self.history = [] # Undo records of the moves made with make_move, most recent last
+        self.hash = 0 # Zobrist hash, kept up to date by put, remove, make_move and unmake_move
+        self.psq = 0 # Sum of PIECE_SQUARE over every piece, kept up to date by put and remove
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.pieces = self.pieces[:]
+        pos.occupied = self.occupied[:]
+        pos.squares = self.squares[:]
+        pos.side = self.side
+        pos.castling = self.castling
+        pos.ep = self.ep
+        pos.ply = self.ply
+        pos.halfmove = self.halfmove
+        pos.history = self.history[:]
+        pos.hash = self.hash
+        pos.psq = self.psq
+        return pos
+
+    # Builds the position from the text of a States/*.txt save, the same format Board.__init__ reads and
+    # Board.__repr__ writes. Pieces loaded from a save have never moved, so castling is allowed whenever a king and
+    # rook still stand on their starting squares.
+    @classmethod
+    def from_state(cls, state):
+        pos = cls()
+        lines = state.splitlines()
+        for idx in range(8):
+            for col in range(8):
+                name = lines[idx][col * 2:col * 2 + 2]
+                if name != "||": pos.put(STATE_NAMES.index(name), (7 - idx) * 8 + col)
+        if len(lines) > 8 and lines[8].strip():
+            pos.ply = int(lines[8])
+            pos.side = pos.ply % 2
+        pos.castling = pos.castling_in_place(WHITE_OO | WHITE_OOO | BLACK_OO | BLACK_OOO)
+        pos.hash = pos.compute_hash()
+        return pos
+
+    # Builds the position from a FEN string. The halfmove and fullmove fields are optional, so the four field
+    # positions of EPD lines can be read as well.
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        pos = cls()
+        for idx, rank in enumerate(fields[0].split("/")):
+            col = 0
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                else:
+                    pos.put(FEN_PIECES.index(char), (7 - idx) * 8 + col)
+                    col += 1
+        pos.side = WHITE if fields[1] == "w" else BLACK
+        castling = 0
+        for char, right in zip("KQkq", (WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO)):
+            if char in fields[2]: castling |= right
+        pos.castling = pos.castling_in_place(castling)
+        if fields[3] != "-": pos.set_ep((int(fields[3][1]) - 1) * 8 + ord(fields[3][0]) - ord("a"))
+        pos.halfmove = int(fields[4]) if len(fields) > 4 else 0
+        pos.ply = (int(fields[5]) - 1) * 2 + pos.side if len(fields) > 5 else pos.side
+        pos.hash = pos.compute_hash()
+        return pos
+
+    # Reads one EPD line, returning the position and a dict of its operations. Operands are kept as strings with any
+    # quotes removed, operations without an operand (or with several) map to a list of their operands.
+    @classmethod
+    def from_epd(cls, line):
+        fields = line.split(None, 4)
+        pos = cls.from_fen(" ".join(fields[:4]))
+        ops = {}
+        if len(fields) > 4:
+            for op in fields[4].split(";"):
+                op = op.strip()
+                if not op: continue
+                parts = op.split(None, 1)
+                operand = parts[1].strip() if len(parts) > 1 else ""
+                if operand.startswith('"'): ops[parts[0]] = operand.strip('"')
+                elif " " in operand or not operand: ops[parts[0]] = operand.split()
+                else: ops[parts[0]] = operand
+            if "hmvc" in ops: pos.halfmove = int(ops["hmvc"])
+            if "fmvn" in ops: pos.ply = (int(ops["fmvn"]) - 1) * 2 + pos.side
+        return pos, ops
+
+    def to_fen(self):
+        return f"{self._fen_fields()} {self.halfmove} {self.ply // 2 + 1}"
+
+    # Writes the position as an EPD line followed by the given operations. String operands are quoted when they
+    # contain a space, list operands are written space separated.
+    def to_epd(self, ops=None):
+        line = self._fen_fields()
+        for op, operands in (ops or {}).items():
+            if isinstance(operands, (list, tuple)):
+                line += f" {' '.join([op] + [str(operand) for operand in operands])};"
+            elif isinstance(operands, str) and " " in operands:
+                line += f' {op} "{operands}";'
+            else:
+                line += f" {op} {operands};"
+        return line
+
+    # The board, side, castling and en passant fields shared by FEN and EPD
+    def _fen_fields(self):
+        ranks = []
+        for row in range(7, -1, -1):
+            rank = ""
+            empty = 0
+            for col in range(8):
+                p_type = self.squares[row * 8 + col]
+                if p_type is None:
+                    empty += 1
+                    continue
+                if empty: rank += str(empty)
+                empty = 0
+                rank += FEN_PIECES[p_type]
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = "".join(char for char, right in zip("KQkq", (WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO))
+                           if self.castling & right) or "-"
+        ep = "-" if self.ep is None else "abcdefgh"[self.ep & 7] + str((self.ep >> 3) + 1)
+        return f"{'/'.join(ranks)} {'wb'[self.side]} {castling} {ep}"
+
+    # Packs the position into PACKED_SIZE bytes, so big sets of positions can be stored back to back in a file and
+    # read without parsing any text (see positions.py). The move history is left out.
+    def pack(self):
+        occ = self.occupied[0] | self.occupied[1]
+        nibbles = bytearray(16)
+        for idx, sq in enumerate(squares_of(occ)):
+            nibbles[idx >> 1] |= self.squares[sq] << (idx & 1) * 4
+        return PACKED_FORMAT.pack(occ, bytes(nibbles), self.side | self.castling << 1,
+                                  255 if self.ep is None else self.ep, self.halfmove, self.ply)
+
+    # Rebuilds a position from the bytes written by pack, starting at offset. Anything supporting the buffer protocol
+    # works, including an mmap of a file of packed positions.
+    @classmethod
+    def unpack(cls, data, offset=0):
+        occ, nibbles, flags, ep, halfmove, ply = PACKED_FORMAT.unpack_from(data, offset)
+        pos = cls()
+        for idx, sq in enumerate(squares_of(occ)):
+            pos.put(nibbles[idx >> 1] >> (idx & 1) * 4 & 15, sq)
+        pos.side = flags & 1
+        pos.castling = flags >> 1
+        pos.ep = None if ep == 255 else ep
+        pos.halfmove = halfmove
+        pos.ply = ply
+        pos.hash = pos.compute_hash()
+        return pos
+
+    # Drops the castling rights whose king and rook aren't standing on their starting squares
+    def castling_in_place(self, castling):
+        for right, (k_sq, _, r_sq, _, _, _) in CASTLING.items():
+            color = WHITE if right < BLACK_OO else BLACK
+            if self.squares[k_sq] != KING * 2 + color or self.squares[r_sq] != ROOK * 2 + color:
+                castling &= ~right
+        return castling
+
+    # Compact copy of the position that pickles to a few hundred bytes, used to send positions to other processes.
+    # Of the move history only the hashes since the last capture or pawn move are kept, which is all is_repetition
+    # looks at, so the copy still sees repetitions of positions from before it was made.
+    def serialize(self):
+        hashes = tuple(record[5] for record in self.history[max(len(self.history) - self.halfmove, 0):])
+        return (tuple(self.pieces), self.side, self.castling, self.ep, self.halfmove, self.ply, hashes)
+
+    @classmethod
+    def deserialize(cls, data):
+        pos = cls()
+        for p_type, bb in enumerate(data[0]):
+            for sq in squares_of(bb):
+                pos.put(p_type, sq)
+        pos.side, pos.castling, pos.ep, pos.halfmove, pos.ply = data[1:6]
+        # Only the hashes of the earlier positions are known, so those moves can't be unmade
+        pos.history = [(None, None, None, None, None, h) for h in data[6]]
+        pos.hash = pos.compute_hash()
+        return pos
+
+    # Sets the en passant square after a double pawn move, but only if a pawn of the side to move can actually capture
+    # there. Otherwise the square is irrelevant and would only make identical positions hash differently.
+    def set_ep(self, sq):
+        if sq is not None and PAWN_ATTACKS[self.side ^ 1][sq] & self.pieces[PAWN * 2 + self.side]:
+            self.ep = sq
+        else:
+            self.ep = None
+
+    # Works out the Zobrist hash of the position from scratch
+    def compute_hash(self):
+        h = 0
+        for sq in range(64):
+            if self.squares[sq] is not None: h ^= ZOBRIST_PIECES[self.squares[sq]][sq]
+        if self.side == BLACK: h ^= ZOBRIST_SIDE
+        h ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep is not None: h ^= ZOBRIST_EP[self.ep & 7]
+        return h
+
+    def put(self, p_type, sq):
+        bit = 1 << sq
+        self.pieces[p_type] |= bit
+        self.occupied[p_type & 1] |= bit
+        self.squares[sq] = p_type
+        self.hash ^= ZOBRIST_PIECES[p_type][sq]
+        self.psq += PIECE_SQUARE[p_type][sq]
+
+    def remove(self, sq):
+        p_type = self.squares[sq]
+        bit = 1 << sq
+        self.pieces[p_type] ^= bit
+        self.occupied[p_type & 1] ^= bit
+        self.squares[sq] = None
+        self.hash ^= ZOBRIST_PIECES[p_type][sq]
+        self.psq -= PIECE_SQUARE[p_type][sq]
+        return p_type
+
+    def all_occupied(self):
+        return self.occupied[0] | self.occupied[1]
+
+    # Plays the move on the position. Everything needed to take it back (the captured piece, the castling rights, the
+    # en passant square, the halfmove clock and the hash from before the move) is pushed as an undo record, so
+    # unmake_move restores the position exactly and the cost of both stays the same no matter how deep a search goes.
+    # The hash is updated incrementally along the way rather than recomputed.
+    def make_move(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        promo = move >> 12
+        p_type = self.squares[frm]
+        color = p_type & 1
+        captured = self.squares[to]
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove, self.hash))
+        self.hash ^= ZOBRIST_SIDE ^ ZOBRIST_CASTLING[self.castling]
+        if self.ep is not None: self.hash ^= ZOBRIST_EP[self.ep & 7]
+        if captured is not None:
+            self.remove(to)
+        elif p_type >> 1 == PAWN and to == self.ep:
+            self.remove(to - 8 if color == WHITE else to + 8)
+        self.remove(frm)
+        self.put(promo * 2 + color if promo else p_type, to)
+        if p_type >> 1 == KING and (to - frm == 2 or frm - to == 2):
+            # The rook jumps over the king, from the corner to the square the king passed over
+            self.put(self.remove(to + 1 if to > frm else to - 2), (frm + to) >> 1)
+        self.castling &= CASTLING_KEEP[frm] & CASTLING_KEEP[to]
+        self.halfmove = 0 if captured is not None or p_type >> 1 == PAWN else self.halfmove + 1
+        self.side ^= 1
+        self.ply += 1
+        self.set_ep((frm + to) >> 1 if p_type >> 1 == PAWN and (to - frm == 16 or frm - to == 16) else None)
+        self.hash ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep is not None: self.hash ^= ZOBRIST_EP[self.ep & 7]
+
+    def unmake_move(self):
+        move, captured, castling, ep, halfmove, h = self.history.pop()
+        frm = move & 63
+        to = (move >> 6) & 63
+        self.side ^= 1
+        self.ply -= 1
+        color = self.side
+        p_type = self.remove(to)
+        if move >> 12: p_type = PAWN * 2 + color
+        self.put(p_type, frm)
+        if captured is not None:
+            self.put(captured, to)
+        elif p_type >> 1 == PAWN and to == ep:
+            self.put(PAWN * 2 + (color ^ 1), to - 8 if color == WHITE else to + 8)
+        if p_type >> 1 == KING and (to - frm == 2 or frm - to == 2):
+            self.put(self.remove((frm + to) >> 1), to + 1 if to > frm else to - 2)
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        self.hash = h
+
+    # What the last move played did besides moving its own piece, so the board's sprites can follow it: the square of
+    # the piece it took (None if it took nothing), the squares the rook went from and to if it castled (None
+    # otherwise) and whether it promoted a pawn
+    def last_move_changes(self):
+        move, captured, _, ep, _, _ = self.history[-1]
+        frm = move & 63
+        to = (move >> 6) & 63
+        p_type = self.squares[to]
+        taken = None
+        if captured is not None: taken = to
+        elif p_type >> 1 == PAWN and to == ep: taken = to - 8 if p_type & 1 == WHITE else to + 8
+        rook = None
+        if p_type >> 1 == KING and (to - frm == 2 or frm - to == 2):
+            rook = (to + 1 if to > frm else to - 2, (frm + to) >> 1)
+        return taken, rook, move >> 12 != 0
+
+    # Passes the move to the other side without moving anything, for null-move pruning. The halfmove clock starts
+    # over so repetitions aren't looked for across it, since passing isn't a real move.
+    def make_null_move(self):
+        self.history.append((None, None, self.castling, self.ep, self.halfmove, self.hash))
+        self.hash ^= ZOBRIST_SIDE
+        if self.ep is not None: self.hash ^= ZOBRIST_EP[self.ep & 7]
+        self.ep = None
+        self.halfmove = 0
+        self.side ^= 1
+        self.ply += 1
+
+    def unmake_null_move(self):
+        _, _, _, ep, halfmove, h = self.history.pop()
+        self.side ^= 1
+        self.ply -= 1
+        self.ep = ep
+        self.halfmove = halfmove
+        self.hash = h
+
+    # Tells whether the position has already been reached since the last capture or pawn move, with the same side to
+    # move. Only moves made on this Position are known, so the game before it was built isn't taken into account.
+    def is_repetition(self):
+        history = self.history
+        i = len(history) - 2
+        stop = max(len(history) - self.halfmove, 0)
+        while i >= stop:
+            if history[i][5] == self.hash: return True
+            i -= 2
+        return False
+
+    def in_check(self, color):
+        king_sq = self.pieces[KING * 2 + color].bit_length() - 1
+        return self.attackers(king_sq, color ^ 1, self.occupied[0] | self.occupied[1]) != 0
+
+    def king_square(self, color):
+        return self.pieces[KING * 2 + color].bit_length() - 1
+
+    # Returns the bitboard of every piece of color by that attacks sq, given the occupancy occ
+    def attackers(self, sq, by, occ):
+        pieces = self.pieces
+        diagonal = pieces[QUEEN * 2 + by] | pieces[BISHOP * 2 + by]
+        straight = pieces[QUEEN * 2 + by] | pieces[ROOK * 2 + by]
+        return (KNIGHT_ATTACKS[sq] & pieces[KNIGHT * 2 + by]) |\
+            (KING_ATTACKS[sq] & pieces[KING * 2 + by]) |\
+            (PAWN_ATTACKS[by ^ 1][sq] & pieces[PAWN * 2 + by]) |\
+            (BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]] & diagonal) |\
+            (ROOK_TABLES[sq][occ & ROOK_MASKS[sq]] & straight)
+
+    def is_attacked(self, sq, by):
+        return self.attackers(sq, by, self.occupied[0] | self.occupied[1]) != 0
+
+    # Bitboard of every square the piece on sq covers, the way the GUI and eval_board count them: squares holding
+    # pieces of either color are included, and pawns cover the squares they can push to rather than their captures
+    # unless there is a piece (or an en passant pawn) to take there.
+    def covered(self, sq):
+        p_type = self.squares[sq]
+        kind = p_type >> 1
+        occ = self.occupied[0] | self.occupied[1]
+        if kind == KING: return KING_ATTACKS[sq]
+        if kind == QUEEN: return queen_attacks(sq, occ)
+        if kind == ROOK: return rook_attacks(sq, occ)
+        if kind == KNIGHT: return KNIGHT_ATTACKS[sq]
+        if kind == BISHOP: return bishop_attacks(sq, occ)
+        color = p_type & 1
+        targets = occ
+        if self.ep is not None and color == self.side: targets |= 1 << self.ep
+        bb = PAWN_ATTACKS[color][sq] & targets
+        if color == WHITE:
+            if not occ & (1 << (sq + 8)):
+                bb |= 1 << (sq + 8)
+                if sq >> 3 == 1 and not occ & (1 << (sq + 16)): bb |= 1 << (sq + 16)
+        else:
+            if not occ & (1 << (sq - 8)):
+                bb |= 1 << (sq - 8)
+                if sq >> 3 == 6 and not occ & (1 << (sq - 16)): bb |= 1 << (sq - 16)
+        return bb
+
+    # Union of covered() over every piece of the given color. Pawns are done all at once by shifting their bitboard.
+    def covered_by(self, color):
+        pieces = self.pieces
+        occ = self.occupied[0] | self.occupied[1]
+        pawns = pieces[PAWN * 2 + color]
+        targets = occ
+        if self.ep is not None and color == self.side: targets |= 1 << self.ep
+        if color == WHITE:
+            bb = (((pawns & ~FILE_H) << 9) | ((pawns & ~FILE_A) << 7)) & targets
+            single = (pawns << 8) & ~occ & FULL
+            bb |= single | ((single & 0xFF0000) << 8) & ~occ
+        else:
+            bb = (((pawns & ~FILE_H) >> 7) | ((pawns & ~FILE_A) >> 9)) & targets
+            single = (pawns >> 8) & ~occ
+            bb |= single | ((single & 0xFF0000000000) >> 8) & ~occ
+        for sq in squares_of(pieces[KNIGHT * 2 + color]):
+            bb |= KNIGHT_ATTACKS[sq]
+        for sq in squares_of(pieces[BISHOP * 2 + color] | pieces[QUEEN * 2 + color]):
+            bb |= BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]]
+        for sq in squares_of(pieces[ROOK * 2 + color] | pieces[QUEEN * 2 + color]):
+            bb |= ROOK_TABLES[sq][occ & ROOK_MASKS[sq]]
+        for sq in squares_of(pieces[KING * 2 + color]):
+            bb |= KING_ATTACKS[sq]
+        return bb
+
+    # Bitboard of the squares the king of the given color can castle to right now
+    def castle_targets(self, color):
+        bb = 0
+        occ = self.occupied[0] | self.occupied[1]
+        for right, (k_sq, to_sq, _, _, empty, safe) in CASTLING.items():
+            if self.castling & right and (right < BLACK_OO) == (color == WHITE) and not occ & empty:
+                for sq in squares_of(safe):
+                    if self.attackers(sq, color ^ 1, occ): break
+                else:
+                    bb |= 1 << to_sq
+        return bb
+
+    # Bitboard of every square attacked by the pieces of the given color, using occ as the occupancy for sliders
+    def attack_map(self, color, occ):
+        pieces = self.pieces
+        pawns = pieces[PAWN * 2 + color]
+        if color == WHITE: bb = (((pawns & ~FILE_H) << 9) | ((pawns & ~FILE_A) << 7)) & FULL
+        else: bb = ((pawns & ~FILE_H) >> 7) | ((pawns & ~FILE_A) >> 9)
+        for sq in squares_of(pieces[KNIGHT * 2 + color]):
+            bb |= KNIGHT_ATTACKS[sq]
+        for sq in squares_of(pieces[BISHOP * 2 + color] | pieces[QUEEN * 2 + color]):
+            bb |= BISHOP_TABLES[sq][occ & BISHOP_MASKS[sq]]
+        for sq in squares_of(pieces[ROOK * 2 + color] | pieces[QUEEN * 2 + color]):
+            bb |= ROOK_TABLES[sq][occ & ROOK_MASKS[sq]]
+        for sq in squares_of(pieces[KING * 2 + color]):
+            bb |= KING_ATTACKS[sq]
+        return bb
+
+    # Returns the pieces of the side to move that are pinned to their king, along with a dict mapping each pinned
+    # square to the ray (including the pinning piece) it is still allowed to move along.
+    def pins(self):
+        side = self.side
+        enemy = side ^ 1
+        own = self.occupied[side]
+        their = self.occupied[enemy]
+        king_sq = self.pieces[KING * 2 + side].bit_length() - 1
+        pieces = self.pieces
+        snipers = (ROOK_TABLES[king_sq][their & ROOK_MASKS[king_sq]] &
+                   (pieces[ROOK * 2 + enemy] | pieces[QUEEN * 2 + enemy])) |\
+            (BISHOP_TABLES[king_sq][their & BISHOP_MASKS[king_sq]] &
+             (pieces[BISHOP * 2 + enemy] | pieces[QUEEN * 2 + enemy]))
+        pinned = 0
+        rays = {}
+        for sniper in squares_of(snipers):
+            between = BETWEEN[king_sq][sniper]
+            blockers = between & own
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+                rays[blockers.bit_length() - 1] = between | (1 << sniper)
+        return pinned, rays
+
+    # Generates every legal move of the side to move. The checking pieces, the pinned pieces and the map of squares
+    # the enemy attacks are worked out once for the whole position, after which each pseudo-legal move only has to be
+    # masked against them instead of being played out and tested for check. With captures set only captures and
+    # promotions are generated, which is what the quiescence search needs, and with quiets set only the rest of the
+    # moves, so the search can generate the two separately.
+    def legal_moves(self, captures=False, quiets=False):
+        side = self.side
+        enemy = side ^ 1
+        pieces = self.pieces
+        own = self.occupied[side]
+        their = self.occupied[enemy]
+        occ = own | their
+        king_sq = pieces[KING * 2 + side].bit_length() - 1
+        moves = []
+        # The king is taken off the board for the attack map so it can't hide from a slider by stepping along its ray
+        attacked = self.attack_map(enemy, occ ^ (1 << king_sq))
+        king_targets = KING_ATTACKS[king_sq] & ~own & ~attacked
+        if captures: king_targets &= their
+        elif quiets: king_targets &= ~their
+        for to in squares_of(king_targets):
+            moves.append(king_sq | (to << 6))
+        checkers = self.attackers(king_sq, enemy, occ)
+        if checkers & (checkers - 1): return moves # Only the king can get out of a double check
+        if checkers:
+            target_mask = (checkers | BETWEEN[king_sq][checkers.bit_length() - 1]) & ~own
+        else:
+            target_mask = ~own & FULL
+            if not captures:
+                for right, (k_sq, to_sq, _, _, empty, safe) in CASTLING.items():
+                    if self.castling & right and k_sq == king_sq and not occ & empty and not attacked & safe:
+                        moves.append(king_sq | (to_sq << 6))
+        # Pawns get their own mask since pushes to the last row are promotions, which count as captures here
+        pawn_mask = target_mask
+        if captures:
+            target_mask &= their
+            pawn_mask &= their | 0xFF000000000000FF
+        elif quiets:
+            target_mask &= ~their
+            pawn_mask &= ~their & 0x00FFFFFFFFFFFF00
+        pinned, rays = self.pins()
+        for kind in (QUEEN, ROOK, KNIGHT, BISHOP):
+            for frm in squares_of(pieces[kind * 2 + side]):
+                if kind == KNIGHT:
+                    if pinned & (1 << frm): continue
+                    bb = KNIGHT_ATTACKS[frm]
+                elif kind == BISHOP:
+                    bb = BISHOP_TABLES[frm][occ & BISHOP_MASKS[frm]]
+                elif kind == ROOK:
+                    bb = ROOK_TABLES[frm][occ & ROOK_MASKS[frm]]
+                else:
+                    bb = ROOK_TABLES[frm][occ & ROOK_MASKS[frm]] | BISHOP_TABLES[frm][occ & BISHOP_MASKS[frm]]
+                bb &= target_mask
+                if pinned & (1 << frm): bb &= rays[frm]
+                for to in squares_of(bb):
+                    moves.append(frm | (to << 6))
+        forward = 8 if side == WHITE else -8
+        start_row = 1 if side == WHITE else 6
+        for frm in squares_of(pieces[PAWN * 2 + side]):
+            one = frm + forward
+            bb = PAWN_ATTACKS[side][frm] & their
+            if not occ & (1 << one):
+                bb |= 1 << one
+                if frm >> 3 == start_row and not occ & (1 << (one + forward)): bb |= 1 << (one + forward)
+            bb &= pawn_mask
+            if pinned & (1 << frm): bb &= rays[frm]
+            for to in squares_of(bb):
+                if to >> 3 == 0 or to >> 3 == 7:
+                    for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                        moves.append(frm | (to << 6) | (promo << 12))
+                else:
+                    moves.append(frm | (to << 6))
+            # En passant can uncover a check along the rank of both pawns, so it is the one move tested by trial
+            if not quiets and self.ep is not None and PAWN_ATTACKS[side][frm] & (1 << self.ep) and\
+                    not self.leaves_king_attacked(frm, self.ep):
+                moves.append(frm | (self.ep << 6))
+        return moves
+
+    # Tells whether a move is legal in the position without generating the legal moves, for moves that come from
+    # somewhere else such as the transposition table or a killer slot and may not even belong to this position
+    def is_legal(self, move):
+        frm = move & 63
+        to = (move >> 6) & 63
+        promo = move >> 12
+        p_type = self.squares[frm]
+        side = self.side
+        if p_type is None or p_type & 1 != side: return False
+        target = self.squares[to]
+        if target is not None and (target & 1 == side or target >> 1 == KING): return False
+        occ = self.occupied[0] | self.occupied[1]
+        kind = p_type >> 1
+        if kind == PAWN:
+            if (to >> 3 == 0 or to >> 3 == 7) != (QUEEN <= promo <= BISHOP): return False
+            forward = 8 if side == WHITE else -8
+            if to == frm + forward:
+                if target is not None: return False
+            elif to == frm + 2 * forward:
+                if frm >> 3 != (1 if side == WHITE else 6) or occ & ((1 << (frm + forward)) | (1 << to)): return False
+            elif not PAWN_ATTACKS[side][frm] & (1 << to) or target is None and to != self.ep:
+                return False
+        elif promo:
+            return False
+        elif kind == KING and abs(to - frm) == 2:
+            for right, (k_sq, to_sq, _, _, empty, safe) in CASTLING.items():
+                if self.castling & right and k_sq == frm and to_sq == to:
+                    return not occ & empty and not self.attack_map(side ^ 1, occ) & safe
+            return False
+        elif kind == KING:
+            if not KING_ATTACKS[frm] & (1 << to): return False
+        elif kind == KNIGHT:
+            if not KNIGHT_ATTACKS[frm] & (1 << to): return False
+        elif not self.covered(frm) & (1 << to):
+            return False
+        return not self.leaves_king_attacked(frm, to)
+
+    # Tells whether moving the piece on frm to to would leave its own king attacked, without changing the position
+    def leaves_king_attacked(self, frm, to):
+        p_type = self.squares[frm]
+        color = p_type & 1
+        enemy = color ^ 1
+        removed = 1 << to
+        if p_type >> 1 == PAWN and to == self.ep:
+            removed = 1 << (to - 8 if color == WHITE else to + 8)
+        occ = ((self.occupied[0] | self.occupied[1]) & ~removed & ~(1 << frm)) | (1 << to)
+        king_sq = to if p_type >> 1 == KING else self.king_square(color)
+        return self.attackers(king_sq, enemy, occ) & ~removed != 0
@@ -0,0 +1,229 @@
+import os
+import random
+import re
+import struct
+import sys
+from bitboard import *
+from log import read_games
+from notation import parse_log, parse_san, parse_uci
+from positions import MappedFile
+
+# Each book entry is a position hash, a move (as packed by encode_move) and the move's weight. Entries are sorted by
+# hash and then by move, so all the moves of a position sit next to each other and can be found with a binary search.
+BOOK_ENTRY = struct.Struct("<QHH")
+MAX_WEIGHT = 0xFFFF
+START_STATE = "States/default.txt"
+
+LOG_TURN = re.compile(r"Turn (\d+), (White|Black): (.*)")
+PGN_TAG = re.compile(r'\[(\w+)\s+"(.*)"\]')
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+
+
+def load_state(path):
+    with open(path, "r") as f:
+        return Position.from_state(f.read())
+
+
+# Reads the games of a PGN file, yielding the starting position, the moves and the result of each. Comments,
+# variations and annotation glyphs are skipped, and games starting from a FEN tag are supported. A game stops at the
+# first move that can't be read.
+def read_pgn(path):
+    with open(path, "r") as f:
+        text = f.read()
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", text)
+    while re.search(r"\([^()]*\)", text):
+        text = re.sub(r"\([^()]*\)", " ", text)
+    tags = {}
+    tokens = []
+    for line in text.splitlines() + ["[End \"\"]"]:
+        tag = PGN_TAG.match(line.strip())
+        if tag is None:
+            tokens += line.split()
+            continue
+        if tokens:
+            yield _pgn_game(tags, tokens)
+            tags = {}
+            tokens = []
+        tags[tag.group(1)] = tag.group(2)
+
+
+def _pgn_game(tags, tokens):
+    start = Position.from_fen(tags["FEN"]) if "FEN" in tags else load_state(START_STATE)
+    pos = start.copy()
+    moves = []
+    result = tags.get("Result", "*")
+    for token in tokens:
+        token = re.sub(r"^\d+\.+", "", token)
+        if not token or token.startswith("$"): continue
+        if token in RESULTS:
+            result = token
+            break
+        move = parse_san(pos, token)
+        if move is None: break
+        pos.make_move(move)
+        moves.append(move)
+    return start, moves, result
+
+
+# Reads the games of a log written by the Log class, yielding the starting position, the moves and the result of each.
+# Logs don't store the starting position, so games that don't begin on the first turn are replayed from every state in
+# the States folder with a matching turn until one of them fits.
+def read_log(path):
+    game = []
+    result = "*"
+    with open(path, "r") as f:
+        for line in f.read().splitlines() + ["-"]:
+            if line.startswith("-"):
+                if game:
+                    start, moves = _log_game(game)
+                    if moves: yield start, moves, result
+                game = []
+                result = "*"
+                continue
+            turn = LOG_TURN.match(line)
+            if turn is not None: game.append((int(turn.group(1)), turn.group(3)))
+            elif "White wins" in line: result = "1-0"
+            elif "Black wins" in line: result = "0-1"
+            elif "tie" in line: result = "1/2-1/2"
+
+
+def _log_game(game):
+    candidates = [START_STATE] if game[0][0] == 1 else\
+        [os.path.join("States", name) for name in sorted(os.listdir("States")) if name.endswith(".txt")]
+    best = (None, [])
+    for path in candidates:
+        start = load_state(path)
+        if start.ply != game[0][0] - 1: continue
+        pos = start.copy()
+        moves = []
+        for _, text in game:
+            move = parse_log(pos, text)
+            if move is None: break
+            pos.make_move(move)
+            moves.append(move)
+        if len(moves) > len(best[1]): best = (start, moves)
+        if len(moves) == len(game): break
+    return best
+
+
+# Reads the games of a record file written by Log, yielding the starting position, the moves and the result of each
+def read_records(path):
+    for game in read_games(path):
+        start = Position.from_fen(game["start"])
+        pos = start.copy()
+        moves = []
+        for name in game["moves"]:
+            move = parse_uci(pos, name)
+            if move is None: break
+            pos.make_move(move)
+            moves.append(move)
+        if moves: yield start, moves, game["result"]
+
+
+# Finds the moves leading from the standard starting position to one of the named openings in the States folder. Only
+# moves that put a piece on a square where the opening has that same piece, coming from a square where the opening
+# doesn't, are tried, which keeps the search tiny. Returns None if there's no such line.
+def opening_line(target):
+    start = load_state(START_STATE)
+
+    def mismatched(pos):
+        return sum(1 for sq in range(64) if pos.squares[sq] != target.squares[sq])
+
+    def find(pos, depth):
+        if depth == 0: return [] if pos.squares == target.squares else None
+        if mismatched(pos) > 4 * depth: return None
+        # Pawn moves are tried first, which gives the usual move orders (1. e4 e5 2. Nf3 rather than 1. Nf3 e5 2. e4)
+        for move in sorted(pos.legal_moves(), key=lambda move: pos.squares[move_from(move)] // 2 != PAWN):
+            frm = move_from(move)
+            if pos.squares[frm] == target.squares[frm] or target.squares[move_to(move)] != pos.squares[frm]: continue
+            pos.make_move(move)
+            line = find(pos, depth - 1)
+            pos.unmake_move()
+            if line is not None: return [move] + line
+        return None
+
+    return find(start, target.ply - start.ply) if target.ply >= start.ply else None
+
+
+# Builds the book from (start, moves, result) games, using the first max_ply moves of each. Following polyglot books,
+# a move earns 2 points for every game the side playing it went on to win and 1 for every draw (games without a
+# result count as draws), so moves that only ever lost are left out.
+def build_book(games, path, max_ply=20):
+    weights = {}
+    for start, moves, result in games:
+        pos = start.copy()
+        for move in moves[:max_ply]:
+            if result == "1/2-1/2" or result == "*": points = 1
+            else: points = 2 if (result == "1-0") == (pos.side == WHITE) else 0
+            if points:
+                entry = (pos.hash, move)
+                weights[entry] = min(weights.get(entry, 0) + points, MAX_WEIGHT)
+            pos.make_move(move)
+    with open(path, "wb") as f:
+        for key, move in sorted(weights):
+            f.write(BOOK_ENTRY.pack(key, move, weights[(key, move)]))
+    return len(weights)
+
+
+# Games for the default book: the lines into every named opening in the States folder, then every PGN or log file given
+def book_games(sources):
+    start = load_state(START_STATE)
+    for name in sorted(os.listdir("States")):
+        if name.endswith(".txt") and name != os.path.basename(START_STATE):
+            line = opening_line(load_state(os.path.join("States", name)))
+            if line: yield start, line, "*"
+    for source in sources:
+        if source.endswith(".pgn"): yield from read_pgn(source)
+        elif source.endswith(".jsonl"): yield from read_records(source)
+        else: yield from read_log(source)
+
+
+# A book file written by build_book. The file is memory-mapped (see MappedFile in positions.py), so opening it is
+# instant whatever its size, and a position's moves are found with a binary search over the sorted entries in O(log n).
+class OpeningBook(MappedFile):
+    def __init__(self, path):
+        super().__init__(path, BOOK_ENTRY.size)
+
+    # Returns the (move, weight) pairs the book has for the position, only keeping moves that are legal in it so a
+    # hash collision can never make the AI play nonsense.
+    def probe(self, pos):
+        lo = 0
+        hi = self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if BOOK_ENTRY.unpack_from(self._map, mid * BOOK_ENTRY.size)[0] < pos.hash: lo = mid + 1
+            else: hi = mid
+        entries = []
+        while lo < self._count:
+            key, move, weight = BOOK_ENTRY.unpack_from(self._map, lo * BOOK_ENTRY.size)
+            if key != pos.hash: break
+            entries.append((move, weight))
+            lo += 1
+        if entries:
+            legal = set(pos.legal_moves())
+            entries = [(move, weight) for move, weight in entries if move in legal]
+        return entries
+
+    # Picks one of the position's book moves at random, in proportion to their weights. None if it's out of book.
+    def choose(self, pos, rng=random):
+        entries = self.probe(pos)
+        if not entries: return None
+        return rng.choices([move for move, _ in entries], [weight for _, weight in entries])[0]
+
+
+# Here is how to build the opening book through the terminal:
+# --> python3 book.py <(~optional) output file> <(~optional) PGN or log files> <(~optional) max_ply=N> <--
+# The book is written to Books/book.bin by default and always includes the lines into the openings of the States
+# folder. Games from Logs/games.jsonl (or Logs/log.txt for older logs) are added when no other files are given.
+if __name__ == '__main__':
+    output = sys.argv[1] if len(sys.argv) > 1 else "Books/book.bin"
+    max_ply = 20
+    sources = []
+    for arg in sys.argv[2:]:
+        if arg.startswith("max_ply="): max_ply = int(arg[8:])
+        else: sources.append(arg)
+    if not sources and os.path.exists("Logs/games.jsonl"): sources.append("Logs/games.jsonl")
+    elif not sources and os.path.exists("Logs/log.txt"): sources.append("Logs/log.txt")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    count = build_book(book_games(sources), output, max_ply)
+    print(f"Wrote {count} book entries to {output}")
@@ -0,0 +1,123 @@
+import threading
+import time
+from notation import san_line
+
+# Runs the thinking of a MiniMax player on a background thread, so the pygame loop keeps drawing and handling events
+# while the AI thinks. The loop calls start once it's the AI's turn and then poll every frame until poll hands back
+# the move. depth, score, best (the SAN of the best move so far) and line (the SAN of the principal variation) are
+# updated after every finished iteration.
+#
+# With pondering, the AI keeps thinking during the opponent's turn on the reply its last search expected. If the
+# opponent plays that reply (a ponder hit), the search carries on as the real one and the time it already spent counts
+# towards the AI's move time, so it usually answers straight away. Any other reply cancels it.
+class AIDriver:
+    def __init__(self, ai, ponder=False):
+        self._ai = ai
+        self._ponder = ponder
+        self._lock = threading.Lock()
+        self._thread = None
+        self._job = 0 # Changes whenever a search is started or cancelled, results of older searches are dropped
+        self._result = None # (move, expected reply) once the running search has finished
+        self._pondering = None # Hash of the position being pondered on
+        self._ponder_start = 0
+        self._deadline = None # When a ponder hit has to answer by
+        self._hurry = False # Set by move_now, the search is stopped on every poll until it has answered
+        self._expected = None # Reply the last search expected, pondered on during the opponent's turn
+        self.depth = 0
+        self.score = 0
+        self.best = None
+        self.line = []
+
+    def is_busy(self):
+        return self._thread is not None
+
+    def is_pondering(self):
+        return self._pondering is not None
+
+    def start(self, pos, ponder=False):
+        self._stop_thread()
+        with self._lock:
+            self._job += 1
+            self._result = None
+            self._hurry = False
+            self.depth = 0
+            self.score = 0
+            self.best = None
+            self.line = []
+        self._thread = threading.Thread(target=self._think, args=(self._job, pos.copy(), ponder), daemon=True)
+        self._thread.start()
+
+    def _think(self, job, pos, ponder):
+        def report(depth, score, move, nodes, seconds):
+            line = self._ai.principal_variation(pos)
+            if not line or line[0] != move: line = [move]
+            line = san_line(pos, line)
+            with self._lock:
+                if job == self._job:
+                    self.depth = depth
+                    self.score = score
+                    self.best = line[0]
+                    self.line = line
+        move = self._ai.think(pos, report, ponder)
+        line = self._ai.principal_variation(pos)
+        with self._lock:
+            if job == self._job: self._result = (move, line[1] if len(line) > 1 and line[0] == move else None)
+
+    # Returns the move once the search has finished, None until then. While pondering it always returns None, the
+    # result is kept until the opponent has moved.
+    def poll(self):
+        if self._thread is None or self._pondering is not None: return None
+        # The deadline of a ponder hit and move_now are enforced from here as well. A search that hasn't started yet
+        # clears its stop flag when it does, so a single stop could be lost.
+        if self._hurry or self._deadline is not None and time.time() >= self._deadline: self._ai.stop()
+        with self._lock:
+            result = self._result
+        if result is None: return None
+        self._thread.join()
+        self._thread = None
+        self._deadline = None
+        self._hurry = False
+        move, self._expected = result
+        return move
+
+    # Makes the running search return the best move it has found so far
+    def move_now(self):
+        if self._thread is not None and self._pondering is None:
+            self._hurry = True
+            self._ai.stop()
+
+    # Stops the running search, or pondering, and throws its result away
+    def cancel(self):
+        with self._lock:
+            self._job += 1
+        self._pondering = None
+        self._deadline = None
+        self._stop_thread()
+
+    def _stop_thread(self):
+        # The search could be stopped just before it starts and resets itself, so it's stopped until it's really done
+        while self._thread is not None and self._thread.is_alive():
+            self._ai.stop()
+            self._thread.join(0.01)
+        self._thread = None
+
+    # Called after the AI's move, pos being the position the opponent is to move in. Starts pondering on the reply
+    # the search expected, if pondering is on and there is one.
+    def start_ponder(self, pos):
+        if not self._ponder or self._expected is None or self._expected not in pos.legal_moves(): return
+        pos = pos.copy()
+        pos.make_move(self._expected)
+        self.start(pos, ponder=True)
+        self._pondering = pos.hash
+        self._ponder_start = time.time()
+
+    # Called after the opponent's move, pos being the position the AI is to move in now
+    def opponent_moved(self, pos):
+        if self._pondering is None: return
+        if pos.hash != self._pondering:
+            self.cancel()
+            return
+        self._pondering = None
+        self._deadline = self._ponder_start + self._ai.get_movetime() / 1000
+        if time.time() >= self._deadline: self._ai.stop()
+        else: self._ai.set_deadline(self._deadline)
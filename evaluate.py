@@ -0,0 +1,60 @@
+from bitboard import *
+
+# Weights of the protection and attack terms of MiniMax.eval_board, indexed by kind of piece. See the comments above
+# MiniMax.eval_board in ai.py for the reasoning behind each of them.
+PROTECTED_VALUES = [0, 0, 50 * 0.5, 30 * 0.5, 32 * 0.5, 15 * 0.5]
+ATTACKED_PROTECTED_VALUES = [30 * 0.2, 270 * 0.2, 50 * 0.2, 30 * 0.2, 32 * 0.2, 10 * 0.2]
+ATTACKED_HANGING_VALUES = [7.5 * 0.8, 90 * 0.8, 50 * 0.8, 30 * 0.8, 32 * 0.8, 10 * 0.8]
+OPEN_SQUARE_VALUE = 0.15
+
+# Most a piece can add to the coverage score of the color attacking it, protected or not
+ATTACKED_MAX_VALUES = [max(values) for values in zip(ATTACKED_PROTECTED_VALUES, ATTACKED_HANGING_VALUES)]
+
+
+# Coverage part of the score for one color, given the squares covered by that color and by its opponent
+def coverage_score(pos, color, covered, opp_covered):
+    squares = pos.squares
+    own = pos.occupied[color]
+    their = pos.occupied[color ^ 1]
+    score = popcount(covered & ~(own | their)) * OPEN_SQUARE_VALUE
+    for sq in squares_of(covered & own):
+        score += PROTECTED_VALUES[squares[sq] >> 1]
+    for sq in squares_of(covered & their):
+        if opp_covered & (1 << sq): score += ATTACKED_PROTECTED_VALUES[squares[sq] >> 1]
+        else: score += ATTACKED_HANGING_VALUES[squares[sq] >> 1]
+    return score
+
+
+# Most coverage_score can be for the color with the pieces on the board: every empty square covered, every one of its
+# pieces protected and every piece of the opponent attacked. Counting the pieces is much cheaper than working out the
+# squares they cover, and since none of the terms are negative, the coverage score is always between 0 and this.
+def coverage_bound(pos, color):
+    pieces = pos.pieces
+    bound = (64 - popcount(pos.occupied[WHITE] | pos.occupied[BLACK])) * OPEN_SQUARE_VALUE
+    for kind in range(6):
+        bound += popcount(pieces[kind * 2 + color]) * PROTECTED_VALUES[kind] +\
+            popcount(pieces[kind * 2 + (color ^ 1)]) * ATTACKED_MAX_VALUES[kind]
+    return bound
+
+
+# Gives the same score as MiniMax.eval_board for a position that isn't stale/checkmate, from the point of view of the
+# side to move. The material, center and pawn push terms are read from Position.psq, which make_move and unmake_move
+# keep up to date. The coverage terms depend on every square each piece covers, which a single move can change all
+# over the board through the sliders it blocks or uncovers, so they're worked out here from the covered_by bitboards
+# instead. With lazy set they're skipped too whenever the incremental part is outside the window (alpha, beta) by more
+# than coverage_bound says they could make up, and the nearest score the full evaluation could have is returned. That
+# score is a real bound, no higher than the full evaluation when it's below alpha and no lower when it's above beta,
+# so the search can prune on it exactly as on the full evaluation.
+def evaluate(pos, alpha=float("-inf"), beta=float("inf"), lazy=False):
+    score = pos.psq if pos.side == WHITE else -pos.psq
+    if lazy:
+        if score <= alpha:
+            upper = score + coverage_bound(pos, pos.side)
+            if upper <= alpha: return upper
+        elif score >= beta:
+            lower = score - coverage_bound(pos, pos.side ^ 1)
+            if lower >= beta: return lower
+    white = pos.covered_by(WHITE)
+    black = pos.covered_by(BLACK)
+    coverage = coverage_score(pos, WHITE, white, black) - coverage_score(pos, BLACK, black, white)
+    return score + coverage if pos.side == WHITE else score - coverage
@@ -1,13 +1,92 @@
-# Class that handles creating a log file for each game
-class Log:
-    def __init__(self):
-        self._log = ""
-
-    def write_line(self, line):
-        self._log += line + "\n"
-
-    def create_log(self):
-        f = open("Logs/log.txt", "a")
-        f.write(self._log)
-        f.write("----------------------------------------\n")
-        f.close()
\ No newline at end of file
+import json
+import time
+from notation import to_uci
+
+# Class that handles creating a log file for each game. Every line is written to Logs/log.txt as soon as it happens,
+# and every move is also recorded as a JSON line in Logs/games.jsonl so games can be read back by programs (see
+# read_games). Both files are flushed after each move, so a crash loses nothing but the move being played.
+class Log:
+    def __init__(self, path="Logs/log.txt", record_path="Logs/games.jsonl"):
+        self._path = path
+        self._record_path = record_path
+        self._file = None
+        self._records = None
+        self._start = None # FEN of the position the game started from
+
+    # Called once the starting position is known. Nothing is written until the first move is played.
+    def start_game(self, pos):
+        self._start = pos.to_fen()
+
+    def _open(self):
+        if self._file is not None: return
+        self._file = open(self._path, "a")
+        self._records = open(self._record_path, "a")
+        self._write_record({"type": "start", "fen": self._start, "time": time.strftime("%Y-%m-%d %H:%M:%S")})
+
+    def _write_record(self, record):
+        self._records.write(json.dumps(record) + "\n")
+
+    def _flush(self):
+        self._file.flush()
+        self._records.flush()
+
+    # Logs a move played on the given turn, san being its SAN and line its human readable form for the text log
+    def write_move(self, move, san, line, turn):
+        self._open()
+        self._file.write(line + "\n")
+        self._write_record({"type": "move", "turn": turn, "move": to_uci(move), "san": san, "text": line})
+        self._flush()
+
+    # Records what the AI expected when it chose its next move: the depth it reached, its score and its principal
+    # variation in SAN. Only goes to the record file, read_games skips these records.
+    def write_analysis(self, depth, score, line):
+        self._open()
+        self._write_record({"type": "analysis", "depth": depth, "score": round(score, 2), "pv": line})
+        self._flush()
+
+    # Logs how the game ended, result being "1-0", "0-1" or "1/2-1/2"
+    def write_result(self, result, line):
+        self._open()
+        self._file.write(line + "\n")
+        self._write_record({"type": "result", "result": result, "text": line})
+        self._flush()
+
+    def create_log(self):
+        if self._file is None:
+            with open(self._path, "a") as f:
+                f.write("----------------------------------------\n")
+            return
+        self._file.write("----------------------------------------\n")
+        self._write_record({"type": "end"})
+        self._file.close()
+        self._records.close()
+        self._file = None
+        self._records = None
+
+
+# Reads the games of a record file written by Log one at a time, so files of any size can be gone through without
+# loading them whole. Each game is a dict with the starting FEN, the moves in UCI notation and in SAN, the text log
+# lines and the result, "*" if the game never finished.
+def read_games(path="Logs/games.jsonl"):
+    game = None
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip(): continue
+            record = json.loads(line)
+            if record["type"] == "start":
+                if game is not None: yield game
+                game = {"start": record["fen"], "time": record.get("time"), "moves": [], "san": [], "text": [],
+                        "result": "*"}
+            elif game is None:
+                continue
+            elif record["type"] == "move":
+                game["moves"].append(record["move"])
+                game["san"].append(record["san"])
+                game["text"].append(record["text"])
+            elif record["type"] == "result":
+                game["result"] = record["result"]
+                game["text"].append(record["text"])
+            elif record["type"] == "end":
+                yield game
+                game = None
+    if game is not None: yield game
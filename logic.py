@@ -1,262 +1,92 @@
-import pygame
-
-# This class internally handles all of the board logic that's necessary to ensure legal moves are played
-class Logic:
-    def __init__(self, bd):
-        self._board = bd
-
-    # This is a utility function that is used by the other functions of this class
-    def verify_legal(self, col, row, legal_moves):
-        if 7 >= col >= 0 and 7 >= row >= 0:
-            legal_moves.add((col, row))
-
-    # Returns the set of all board spaces a given piece can move to, disregarding potential discovered checks/pins and
-    # piece color.
-    def get_legal_piece(self, piece, opponent, depth):
-        legal_mvs = set()
-        tiles = self._board.get_tiles()
-        coords = piece.get_coords()
-        col = coords[0]
-        row = coords[1]
-
-        if piece.get_type() // 2 == 0: # Piece is a king
-            self.verify_legal(col + 1, row, legal_mvs)
-            self.verify_legal(col, row + 1, legal_mvs)
-            self.verify_legal(col + 1, row + 1, legal_mvs)
-            self.verify_legal(col + 1, row - 1, legal_mvs)
-            self.verify_legal(col - 1, row + 1, legal_mvs)
-            self.verify_legal(col - 1, row - 1, legal_mvs)
-            self.verify_legal(col - 1, row, legal_mvs)
-            self.verify_legal(col, row - 1, legal_mvs)
-            # This section is for castling purposes. Castling can only be performed when all of the spaces in between a
-            # king and a rook are not under attack by the opposing player and neither the king or rook has moved.
-            if depth == 0:
-                opp_mvs = self.get_legal_player(opponent)
-                if piece.get_n_move() and tiles[col + 3][row].get_piece() is not None and \
-                        tiles[col + 3][row].get_piece().get_n_move():
-                    can_castle = True
-                    for i in range(col, col + 3):
-                        if (i, row) in opp_mvs: can_castle = False
-                    for i in range(col + 1, col + 3):
-                        if tiles[i][row].get_piece() is not None: can_castle = False
-                    if can_castle: legal_mvs.add((col + 2, row))
-                if piece.get_n_move() and tiles[col - 4][row].get_piece() is not None and \
-                        tiles[col - 4][row].get_piece().get_n_move():
-                    can_castle = True
-                    for i in range(col - 3, col + 1):
-                        if (i, row) in opp_mvs: can_castle = False
-                    for i in range(col - 3, col):
-                        if tiles[i][row].get_piece() is not None: can_castle = False
-                    if can_castle: legal_mvs.add((col - 2, row))
-
-        elif piece.get_type() // 2 == 1: # Piece is a queen
-            tmp_col = col + 1
-            tmp_row = row + 1
-            while tmp_col <= 7 and tmp_row <= 7:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col += 1
-                tmp_row += 1
-            tmp_col = col - 1
-            tmp_row = row + 1
-            while tmp_col >= 0 and tmp_row <= 7:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col -= 1
-                tmp_row += 1
-            tmp_col = col + 1
-            tmp_row = row - 1
-            while tmp_col <= 7 and tmp_row >= 0:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col += 1
-                tmp_row -= 1
-            tmp_col = col - 1
-            tmp_row = row - 1
-            while tmp_col >= 0 and tmp_row >= 0:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col -= 1
-                tmp_row -= 1
-            tmp_col = col + 1
-            while tmp_col <= 7:
-                self.verify_legal(tmp_col, row, legal_mvs)
-                if tiles[tmp_col][row].get_piece() is not None: break
-                tmp_col += 1
-            tmp_col = col - 1
-            while tmp_col >= 0:
-                self.verify_legal(tmp_col, row, legal_mvs)
-                if tiles[tmp_col][row].get_piece() is not None: break
-                tmp_col -= 1
-            tmp_row = row + 1
-            while tmp_row <= 7:
-                self.verify_legal(col, tmp_row, legal_mvs)
-                if tiles[col][tmp_row].get_piece() is not None: break
-                tmp_row += 1
-            tmp_row = row - 1
-            while tmp_row >= 0:
-                self.verify_legal(col, tmp_row, legal_mvs)
-                if tiles[col][tmp_row].get_piece() is not None: break
-                tmp_row -= 1
-
-        elif piece.get_type() // 2 == 2: # Piece is a rook
-            tmp_col = col + 1
-            while tmp_col <= 7:
-                self.verify_legal(tmp_col, row, legal_mvs)
-                if tiles[tmp_col][row].get_piece() is not None: break
-                tmp_col += 1
-            tmp_col = col - 1
-            while tmp_col >= 0:
-                self.verify_legal(tmp_col, row, legal_mvs)
-                if tiles[tmp_col][row].get_piece() is not None: break
-                tmp_col -= 1
-            tmp_row = row + 1
-            while tmp_row <= 7:
-                self.verify_legal(col, tmp_row, legal_mvs)
-                if tiles[col][tmp_row].get_piece() is not None: break
-                tmp_row += 1
-            tmp_row = row - 1
-            while tmp_row >= 0:
-                self.verify_legal(col, tmp_row, legal_mvs)
-                if tiles[col][tmp_row].get_piece() is not None: break
-                tmp_row -= 1
-
-        elif piece.get_type() // 2 == 3: # Piece is a knight
-            self.verify_legal(col + 1, row + 2, legal_mvs)
-            self.verify_legal(col + 2, row + 1, legal_mvs)
-            self.verify_legal(col - 1, row + 2, legal_mvs)
-            self.verify_legal(col + 2, row - 1, legal_mvs)
-            self.verify_legal(col - 2, row + 1, legal_mvs)
-            self.verify_legal(col + 1, row - 2, legal_mvs)
-            self.verify_legal(col - 1, row - 2, legal_mvs)
-            self.verify_legal(col - 2, row - 1, legal_mvs)
-
-        elif piece.get_type() // 2 == 4: # Piece is a bishop
-            tmp_col = col + 1
-            tmp_row = row + 1
-            while tmp_col <= 7 and tmp_row <= 7:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col += 1
-                tmp_row += 1
-            tmp_col = col - 1
-            tmp_row = row + 1
-            while tmp_col >= 0 and tmp_row <= 7:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col -= 1
-                tmp_row += 1
-            tmp_col = col + 1
-            tmp_row = row - 1
-            while tmp_col <= 7 and tmp_row >= 0:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col += 1
-                tmp_row -= 1
-            tmp_col = col - 1
-            tmp_row = row - 1
-            while tmp_col >= 0 and tmp_row >= 0:
-                self.verify_legal(tmp_col, tmp_row, legal_mvs)
-                if tiles[tmp_col][tmp_row].get_piece() is not None: break
-                tmp_col -= 1
-                tmp_row -= 1
-
-        elif piece.get_type() // 2 == 5: # Piece is a pawn
-            if piece.get_type() % 2 == 0: # Piece is white
-                if piece.get_coords()[1] == 1 and tiles[col][row + 1].get_piece() is None and tiles[col][row + 2].get_piece() is None:
-                    legal_mvs.add((col, row + 2))
-                if tiles[col][row + 1].get_piece() is None:
-                    legal_mvs.add((col, row + 1))
-                if col + 1 <= 7 and row + 1 <= 7 and tiles[col + 1][row + 1].get_piece() is not None:
-                    legal_mvs.add((col + 1, row + 1))
-                if col - 1 >= 0 and row + 1 <= 7 and tiles[col - 1][row + 1].get_piece() is not None:
-                    legal_mvs.add((col - 1, row + 1))
-                # En passant
-                if col + 1 <= 7 and row + 1 <= 7 and tiles[col + 1][row].get_piece() is not None and\
-                        tiles[col + 1][row].get_piece().get_type() % 2 != piece.get_type() % 2 and\
-                        tiles[col + 1][row].get_piece().get_d_move():
-                    legal_mvs.add((col + 1, row + 1))
-                if col - 1 >= 0 and row + 1 <= 7 and tiles[col - 1][row].get_piece() is not None and\
-                        tiles[col - 1][row].get_piece().get_type() % 2 != piece.get_type() % 2 and\
-                        tiles[col - 1][row].get_piece().get_d_move():
-                    legal_mvs.add((col - 1, row + 1))
-            else: # Piece is black
-                if piece.get_coords()[1] == 6 and tiles[col][row - 1].get_piece() is None and tiles[col][row - 2].get_piece() is None:
-                    legal_mvs.add((col, row - 2))
-                if tiles[col][row - 1].get_piece() is None:
-                    legal_mvs.add((col, row - 1))
-                if col + 1 <= 7 and row - 1 >= 0 and tiles[col + 1][row - 1].get_piece() is not None:
-                    legal_mvs.add((col + 1, row - 1))
-                if col - 1 >= 0 and row - 1 >= 0 and tiles[col - 1][row - 1].get_piece() is not None:
-                    legal_mvs.add((col - 1, row - 1))
-                # En passant
-                if col + 1 <= 7 and row - 1 >= 0 and tiles[col + 1][row].get_piece() is not None and\
-                        tiles[col + 1][row].get_piece().get_type() % 2 != piece.get_type() % 2 and\
-                        tiles[col + 1][row].get_piece().get_d_move():
-                    legal_mvs.add((col + 1, row - 1))
-                if col - 1 >= 0 and row - 1 >= 0 and tiles[col - 1][row].get_piece() is not None and\
-                        tiles[col - 1][row].get_piece().get_type() % 2 != piece.get_type() % 2 and\
-                        tiles[col - 1][row].get_piece().get_d_move():
-                    legal_mvs.add((col - 1, row - 1))
-        return legal_mvs
-
-    # returns the set of all legal moves a player can make, still disregarding discovered checks/pins and piece color
-    def get_legal_player(self, player):
-        legal_mvs = set()
-        for piece in player.get_owned():
-            for coords in self.get_legal_piece(piece, None, 1):
-                legal_mvs.add(coords)
-        return legal_mvs
-
-    # Safely checks if a given move is legal by simulating the play on the board and then reverting all changes
-    def safe_check_legal(self, selected_piece, target_tile, player, opponent):
-        if target_tile.get_coords() not in self.get_legal_piece(selected_piece, opponent, 0): return False
-        if target_tile.get_piece() is not None and\
-                target_tile.get_piece().get_type() % 2 == selected_piece.get_type() % 2: return False
-        tmp_piece = target_tile.get_piece()
-        # This simulates a capture so that capturing a piece that has put the turn player's king in check is legal
-        if tmp_piece is not None:
-            opponent.get_owned().remove(tmp_piece)
-        tmp_tile = selected_piece.get_tile()
-        selected_piece.change_tiles(target_tile)
-        king_coords = player.get_king().get_coords()
-        if king_coords in self.get_legal_player(opponent):
-            selected_piece.change_tiles(tmp_tile)
-            target_tile.set_piece(tmp_piece)
-            if tmp_piece is not None:
-                opponent.get_owned().add(tmp_piece)
-            return False
-        selected_piece.change_tiles(tmp_tile)
-        target_tile.set_piece(tmp_piece)
-        if tmp_piece is not None:
-            opponent.get_owned().add(tmp_piece)
-        return True
-
-    # Gets the "true" legal spaces a piece can move to, the spaces that won't leave the player's king in check
-    def get_true_legal_piece(self, piece, player, opponent):
-        true_legal = set()
-        for coords in self.get_legal_piece(piece, opponent, 0):
-            if self.safe_check_legal(piece, self._board.get_tile(coords), player, opponent):
-                true_legal.add(coords)
-        return true_legal
-
-    # Gets the "true" legal spaces all of a player's pieces can move to that won't leave that player's king in check
-    def get_true_legal_player(self, player, opponent):
-        true_legal = set()
-        for piece in player.get_owned():
-            for coords in self.get_true_legal_piece(piece, player, opponent):
-                true_legal.add(coords)
-        return true_legal
-
-    # Checks all possible legal moves a player can make to verify whether the game is in stale/checkmate
-    # "NM" == No Mate, "SM" == Stalemate, "CM" == Checkmate
-    def safe_check_mate(self, player, opponent):
-        for piece in player.get_owned():
-            for tile_coords in self.get_legal_piece(piece, opponent, 0):
-                if self.safe_check_legal(piece, self._board.get_tile(tile_coords), player, opponent):
-                    return "NM"
-        king_coords = player.get_king().get_coords()
-        if king_coords not in self.get_legal_player(opponent):
-            return "SM"
-        return "CM"
-
+from bitboard import *
+
+# Everything the GUI needs to know about a position at the start of a turn, worked out from a single call to
+# Position.legal_moves: the legal moves themselves, the coords every piece of the side to move can go to, whether that
+# side is in check and whether the game is over ("NM", "SM" or "CM" like BitLogic.safe_check_mate). key is the hash of
+# the position.
+class TurnInfo:
+    def __init__(self, pos):
+        self.key = pos.hash
+        self.moves = pos.legal_moves()
+        self.legal_map = {}
+        for move in self.moves:
+            self.legal_map.setdefault(coords(move & 63), set()).add(coords((move >> 6) & 63))
+        self.check = pos.in_check(pos.side)
+        self.status = "NM" if self.moves else "CM" if self.check else "SM"
+
+
+# Handles all of the board logic that's necessary to ensure legal moves are played, answered from the board's bitboard
+# Position. The position is played along with every move, so it always matches the board the GUI is showing, and the
+# tiles and pieces are never looked at. Questions about the side to move are answered from a TurnInfo of the current
+# position, so picking up a piece and checking for mate are lookups once it's there. It's keyed by the position's
+# hash, which makes it stale as soon as a move is played. The next one is worked out as soon as that move is logged,
+# which needs its check and mate state anyway.
+class BitLogic:
+    def __init__(self, bd):
+        self._board = bd
+        self._turn = None # TurnInfo of the last position asked about
+
+    def get_position(self):
+        return self._board.position
+
+    # TurnInfo of the board's position, worked out here the first time it's asked for
+    def turn_info(self):
+        pos = self.get_position()
+        if self._turn is None or self._turn.key != pos.hash: self._turn = TurnInfo(pos)
+        return self._turn
+
+    # Returns the set of coords a given piece covers, disregarding potential discovered checks/pins and piece color.
+    # Castling squares are only included when depth == 0.
+    def get_legal_piece(self, piece, opponent, depth):
+        pos = self.get_position()
+        sq = square(piece.get_coords())
+        bb = pos.covered(sq)
+        if depth == 0 and piece.get_type() // 2 == KING:
+            bb |= pos.castle_targets(piece.get_type() % 2)
+        return {coords(to) for to in squares_of(bb)}
+
+    def get_legal_player(self, player):
+        pos = self.get_position()
+        return {coords(to) for to in squares_of(pos.covered_by(player.get_id()))}
+
+    # Maps the coords of every piece of the side to move to the set of coords it can legally move to. This is built
+    # from a single call to Position.legal_moves, which handles pins and checks for the whole position at once.
+    def get_legal_map(self, pos):
+        legal_map = {}
+        for move in pos.legal_moves():
+            legal_map.setdefault(coords(move & 63), set()).add(coords((move >> 6) & 63))
+        return legal_map
+
+    # The position always has the turn player to move, so the opponent's moves are generated on a copy that hands
+    # them the move
+    def get_player_position(self, player):
+        pos = self.get_position()
+        if pos.side != player.get_id():
+            pos = pos.copy()
+            pos.hash ^= ZOBRIST_SIDE ^ (ZOBRIST_EP[pos.ep & 7] if pos.ep is not None else 0)
+            pos.side ^= 1
+            pos.ep = None
+        return pos
+
+    def get_true_legal_piece(self, piece, player, opponent):
+        if player.get_id() == self.get_position().side:
+            return set(self.turn_info().legal_map.get(piece.get_coords(), ()))
+        pos = self.get_player_position(player)
+        return self.get_legal_map(pos).get(piece.get_coords(), set())
+
+    def get_true_legal_player(self, player, opponent):
+        pos = self.get_player_position(player)
+        true_legal = set()
+        for move in pos.legal_moves():
+            true_legal.add(coords((move >> 6) & 63))
+        return true_legal
+
+    # Checks whether the player is in stalemate or checkmate: "NM" == No Mate, "SM" == Stalemate, "CM" == Checkmate
+    def safe_check_mate(self, player, opponent):
+        if player.get_id() == self.get_position().side: return self.turn_info().status
+        pos = self.get_player_position(player)
+        if pos.legal_moves():
+            return "NM"
+        if not pos.in_check(pos.side):
+            return "SM"
+        return "CM"
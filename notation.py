@@ -0,0 +1,131 @@
+import re
+from bitboard import *
+
+# Move notation shared by the log, the opening book and the UCI front end. UCI names a move by its from and to squares
+# ("e2e4", "e7e8q"), standard algebraic notation (SAN) by the piece and its destination ("Nf3", "exd5", "e8=Q+"),
+# adding the file and/or rank of the piece only when another piece of the same kind could move to the same square.
+
+PIECE_LETTERS = "KQRNB" # Indexed by kind of piece, pawns don't get a letter
+SAN_MOVE = re.compile(r"([KQRNB])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRNBqrnb]))?")
+LOG_LETTERS = "kqrnbp"
+LOG_MOVE = re.compile(r"[kqrnbp]([A-H][1-8])(?:->|-x-[qrnbp]?|-/-)([A-H][1-8])")
+
+
+def square_name(sq):
+    return "abcdefgh"[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name):
+    return (int(name[1]) - 1) * 8 + ord(name[0]) - ord("a")
+
+
+def to_uci(move):
+    name = square_name(move_from(move)) + square_name(move_to(move))
+    if move_promo(move): name += "kqrnbp"[move_promo(move)]
+    return name
+
+
+# Finds the legal move with the given UCI name, None if there isn't one
+def parse_uci(pos, text):
+    for move in pos.legal_moves():
+        if to_uci(move) == text: return move
+    return None
+
+
+# SAN of a legal move in the position, which is left unchanged. legal can be given to save generating the moves again,
+# and mark, the "+" or "#" the move gets ("" for neither), when it's already known so the move isn't played to find it.
+def to_san(pos, move, legal=None, mark=None):
+    if legal is None: legal = pos.legal_moves()
+    frm = move_from(move)
+    to = move_to(move)
+    kind = pos.squares[frm] >> 1
+    if kind == KING and abs(to - frm) == 2:
+        san = "O-O" if to > frm else "O-O-O"
+    else:
+        capture = pos.squares[to] is not None or kind == PAWN and to == pos.ep
+        if kind == PAWN:
+            san = "abcdefgh"[frm & 7] + "x" if capture else ""
+        else:
+            san = PIECE_LETTERS[kind]
+            rivals = [move_from(other) for other in legal if move_to(other) == to and other != move and
+                      move_from(other) != frm and pos.squares[move_from(other)] == pos.squares[frm]]
+            if rivals:
+                if all(sq & 7 != frm & 7 for sq in rivals): san += "abcdefgh"[frm & 7]
+                elif all(sq >> 3 != frm >> 3 for sq in rivals): san += str((frm >> 3) + 1)
+                else: san += square_name(frm)
+            if capture: san += "x"
+        san += square_name(to)
+        if move_promo(move): san += "=" + PIECE_LETTERS[move_promo(move)]
+    if mark is not None: return san + mark
+    pos.make_move(move)
+    if pos.in_check(pos.side): san += "#" if not pos.legal_moves() else "+"
+    pos.unmake_move()
+    return san
+
+
+# SAN of each move of a line played from the position, such as a principal variation. The position is left unchanged.
+def san_line(pos, moves):
+    line = []
+    for move in moves:
+        line.append(to_san(pos, move))
+        pos.make_move(move)
+    for _ in moves:
+        pos.unmake_move()
+    return line
+
+
+# Finds the legal move written in SAN, None if there isn't one. Check and annotation marks are ignored, castling can
+# be written with zeros as well and promotions with or without the "=".
+def parse_san(pos, text):
+    text = text.rstrip("+#!?")
+    moves = pos.legal_moves()
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        k_sq = pos.king_square(pos.side)
+        to = k_sq + (2 if len(text) == 3 else -2)
+        for move in moves:
+            if move_from(move) == k_sq and move_to(move) == to: return move
+        return None
+    match = SAN_MOVE.fullmatch(text)
+    if match is None: return None
+    kind = PIECE_LETTERS.index(match.group(1)) if match.group(1) else PAWN
+    to = parse_square(match.group(4))
+    promo = PIECE_LETTERS.index(match.group(5).upper()) if match.group(5) else 0
+    for move in moves:
+        frm = move_from(move)
+        if move_to(move) != to or move_promo(move) != promo or pos.squares[frm] >> 1 != kind: continue
+        if match.group(2) and frm & 7 != ord(match.group(2)) - ord("a"): continue
+        if match.group(3) and frm >> 3 != int(match.group(3)) - 1: continue
+        return move
+    return None
+
+
+# The notation of the game's text log, which the opening book can still read games from: the piece and its square,
+# then "->" and the square it moves to, "-x-" and the piece taken and its square for a capture, or "-/-" for an en
+# passant capture, such as "pE2->E4" and "nF3-x-pE5". Castling is written "O-O" or "O-O-O". Promoted pawns are named
+# by the piece they became. mark is added the same way as in SAN.
+def to_log(pos, move, mark=""):
+    frm = move_from(move)
+    to = move_to(move)
+    kind = pos.squares[frm] >> 1
+    if kind == KING and abs(to - frm) == 2: return ("O-O" if to > frm else "O-O-O") + mark
+    text = LOG_LETTERS[kind] + square_name(frm).upper()
+    if kind == PAWN and to == pos.ep: text += "-/-"
+    elif pos.squares[to] is not None: text += "-x-" + LOG_LETTERS[pos.squares[to] >> 1]
+    else: text += "->"
+    return text + square_name(to).upper() + mark
+
+
+# Finds the legal move written in the text log notation of to_log, None if there isn't one. The log doesn't say what
+# a pawn was promoted to, it was always a queen.
+def parse_log(pos, text):
+    text = text.rstrip("+#")
+    if text.startswith("O-O"):
+        k_sq = pos.king_square(pos.side)
+        frm, to = k_sq, k_sq + (-2 if text.startswith("O-O-O") else 2)
+    else:
+        match = LOG_MOVE.match(text)
+        if match is None: return None
+        frm, to = [parse_square(name.lower()) for name in match.groups()]
+    for move in pos.legal_moves():
+        if move_from(move) == frm and move_to(move) == to and move_promo(move) in (0, QUEEN): return move
+    return None
@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from bitboard import *
+from search import Search, MATE, INFINITY, MAX_PLY, tablebase_score
+from tablebase import Tablebase
+
+# Each worker process keeps a single Search for its whole life, so its transposition table, killers and history carry
+# over from one root move and one iteration to the next. _search_id is the ParallelSearch.iterate call the worker's
+# last task came from, once it changes the worker starts a new search of its own.
+_worker = None
+_search_id = None
+
+
+def _init_worker(tt_size, stop_event, tablebase_dir):
+    global _worker
+    _worker = Search(tt_size, tablebase=Tablebase(tablebase_dir) if tablebase_dir is not None else None)
+    _worker.stop_event = stop_event
+
+
+# Searches the subtree of one root move inside a worker process. The position arrives in its serialized form and
+# the result is (move, score, nodes, quiescence nodes, cutoffs, first move cutoffs, finished, principal variation,
+# re-searches), where finished is False if the deadline, the node limit or a stop cut it short. The principal
+# variation starts with the move and only holds if it beat alpha.
+def _search_root_move(data, move, depth, alpha, deadline, max_nodes, search_id):
+    global _search_id
+    pos = Position.deserialize(data)
+    _worker.start(nodes=max_nodes, deadline=deadline, fresh=search_id != _search_id)
+    _search_id = search_id
+    pos.make_move(move)
+    score = -_worker.alpha_beta_prune(pos, depth - 1, -INFINITY, -alpha, 1)
+    return move, score, _worker.nodes, _worker.qnodes, _worker.cutoffs, _worker.first_cutoffs,\
+        not _worker.is_stopped(), [move] + _worker.pv_table[1], _worker.researches
+
+
+# Splits the root moves of an iterative deepening search across a pool of worker processes, which gets around the
+# GIL. At every depth the previous iteration's best move is searched first, and its score is used as alpha for all
+# of the other root moves, which are then searched at the same time. Only serialized positions (tuples of ints) are
+# sent to the workers. Has the same iterate interface and counters as Search, added up over the workers, so MiniMax
+# can use either.
+class ParallelSearch:
+    def __init__(self, workers=None, tt_size=1 << 18, tablebase=None):
+        self.workers = workers or os.cpu_count()
+        self.tablebase = tablebase
+        self._stop_event = multiprocessing.Event()
+        # The tables are memory-mapped files, so each worker opens its own from the same directory
+        tablebase_dir = tablebase.directory if tablebase is not None else None
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                         initargs=(tt_size, self._stop_event, tablebase_dir))
+        self.nodes = 0 # Nodes of the main search, over all the workers
+        self.qnodes = 0 # Nodes of the quiescence search, counted separately
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.researches = 0
+        self._pv_key = None
+        self._deadline = None
+        self._max_nodes = None
+        self._search_id = 0
+
+    def stop(self):
+        self._stop_event.set()
+
+    # Same as Search.first_cutoff_rate, over the cutoffs of all the workers
+    def first_cutoff_rate(self):
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    # Can be called from another thread while a search is running. Root moves that have already been handed to the
+    # workers keep the deadline they were given.
+    def set_deadline(self, deadline):
+        self._deadline = deadline
+
+    def close(self):
+        self._pool.shutdown()
+
+    # Principal variation of the last search if it was from the position. The workers' transposition tables can't be
+    # read from here, so there is nothing to fall back on otherwise.
+    def principal_variation(self, pos, length=MAX_PLY):
+        return self.pv[:length] if pos.hash == self._pv_key else []
+
+    def _out_of_limits(self):
+        return self._deadline is not None and time.time() >= self._deadline or\
+            self._max_nodes is not None and self.nodes + self.qnodes >= self._max_nodes
+
+    # Hands the root moves to the workers, all with the same alpha, and waits for every one of them. The limits are
+    # checked each time one comes back and when the deadline passes, and once they've run out the workers still
+    # searching are stopped. Returns the results in the order of the moves.
+    def _search_moves(self, data, moves, depth, alpha, limited):
+        deadline = self._deadline if limited else None
+        max_nodes = self._max_nodes - self.nodes - self.qnodes if limited and self._max_nodes is not None else None
+        futures = [self._pool.submit(_search_root_move, data, move, depth, alpha, deadline, max_nodes,
+                                     self._search_id) for move in moves]
+        pending = set(futures)
+        while pending:
+            timeout = max(self._deadline - time.time(), 0) if limited and self._deadline is not None else None
+            done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, _, nodes, qnodes, cutoffs, first_cutoffs, _, _, researches = future.result()
+                self.nodes += nodes
+                self.qnodes += qnodes
+                self.cutoffs += cutoffs
+                self.first_cutoffs += first_cutoffs
+                self.researches += researches
+            if limited and self._out_of_limits(): self._stop_event.set()
+        return [future.result() for future in futures]
+
+    # Same as Search.iterate, nodes again limits the main and quiescence nodes together. Depth 1 is always searched
+    # to the end, whatever the limits, so the move returned has been searched. A stop can still cut it short, and
+    # then like in Search the first move's partial result is kept.
+    def iterate(self, pos, depth=MAX_PLY, movetime=None, nodes=None, report=None):
+        self._stop_event.clear()
+        start = time.time()
+        self._deadline = start + movetime / 1000 if movetime is not None else None
+        self._max_nodes = nodes
+        self.nodes = 0
+        self.qnodes = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.researches = 0
+        self._pv_key = pos.hash
+        self._search_id += 1
+        moves = pos.legal_moves()
+        if not moves: return None
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(pos)
+            if move is not None:
+                self.score = tablebase_score(self.tablebase.probe(pos), 0)
+                self.pv = [move]
+                if report is not None: report(0, self.score, move, 0, time.time() - start)
+                return move
+        data = pos.serialize()
+        best_move = moves[0]
+        for d in range(1, depth + 1):
+            limited = d > 1
+            _, alpha, _, _, _, _, finished, pv, _ = self._search_moves(data, [best_move], d, -INFINITY, limited)[0]
+            if not finished and limited: break
+            move = best_move
+            others = [other for other in moves if other != best_move]
+            for other, score, _, _, _, _, done, line, _ in self._search_moves(data, others, d, alpha, limited):
+                if not done: finished = False
+                elif score > alpha:
+                    alpha = score
+                    move = other
+                    pv = line
+            if not finished and limited: break
+            best_move = move
+            self.depth = d
+            self.score = alpha
+            self.pv = pv
+            if report is not None: report(d, alpha, move, self.nodes + self.qnodes, time.time() - start)
+            if not finished or len(moves) == 1 or abs(alpha) >= MATE - MAX_PLY: break
+            if self._stop_event.is_set() or self._out_of_limits(): break
+        return best_move
+
+
+# Measures how the search scales with the number of worker processes by searching the same position to a fixed
+# depth with 1, 2, 4 and 8 workers.
+# --> python3 parallel.py <(~optional) depth> <(~optional) board_state> <--
+if __name__ == '__main__':
+    import sys
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    state = sys.argv[2] if len(sys.argv) > 2 else "States/default.txt"
+    with open(state, "r") as f:
+        pos = Position.from_state(f.read())
+    base = None
+    for workers in (1, 2, 4, 8):
+        search = ParallelSearch(workers)
+        search.iterate(pos, depth=1) # Starts the worker processes before timing
+        start = time.time()
+        move = search.iterate(pos, depth=depth)
+        seconds = time.time() - start
+        search.close()
+        base = base or seconds
+        print(f"workers {workers}: depth {search.depth}, best {coords(move_from(move))}->{coords(move_to(move))}, "
+              f"{search.nodes} nodes, {seconds:.2f}s, {int(search.nodes / seconds)} nps, speedup {base / seconds:.2f}x")
@@ -0,0 +1,106 @@
+import time
+from bitboard import *
+from notation import to_uci
+
+# Reference positions with their known perft node counts, starting at depth 1. The first six are the standard perft
+# positions from the Chess Programming Wiki, which between them cover castling, en passant, promotions and discovered
+# checks. The counts of the States/ openings were cross-checked against an independent move generator, they also
+# guard the save file parser and the castling rights it hands out.
+REFERENCE = [
+    ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", [20, 400, 8902, 197281, 4865609]),
+    ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", [48, 2039, 97862, 4085603]),
+    ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10", [46, 2079, 89890, 3894594]),
+    ("States/caro-kahn_defense.txt", [30, 625, 19256, 456786]),
+    ("States/default.txt", [20, 400, 8902, 197281]),
+    ("States/english_opening.txt", [20, 441, 9744, 240082]),
+    ("States/french_defense.txt", [30, 891, 27272, 822484]),
+    ("States/indian_defense.txt", [28, 613, 17844, 425466]),
+    ("States/italian_game.txt", [31, 1016, 31024, 1008043]),
+    ("States/pirc_defense.txt", [30, 781, 24086, 639932]),
+    ("States/queen's_gambit.txt", [28, 838, 24047, 742744]),
+    ("States/reti_opening.txt", [20, 440, 9748, 233491]),
+    ("States/ruy_lopez.txt", [30, 959, 28579, 908001]),
+    ("States/sicilian_defense.txt", [30, 652, 20035, 482325]),
+]
+
+
+# Loads a position from either a States/*.txt save file or a FEN string
+def load_position(source):
+    if source.endswith(".txt"):
+        with open(source, "r") as f:
+            return Position.from_state(f.read())
+    return Position.from_fen(source)
+
+
+# Counts the leaf nodes of the move tree to the given depth. The last ply isn't played out, the number of legal moves
+# there is all that's needed.
+def perft(pos, depth):
+    moves = pos.legal_moves()
+    if depth <= 1: return len(moves) if depth == 1 else 1
+    nodes = 0
+    for move in moves:
+        pos.make_move(move)
+        nodes += perft(pos, depth - 1)
+        pos.unmake_move()
+    return nodes
+
+
+# Perft split up by root move, which is what's needed to track down which move a wrong count comes from
+def divide(pos, depth):
+    counts = {}
+    for move in pos.legal_moves():
+        pos.make_move(move)
+        counts[move] = perft(pos, depth - 1)
+        pos.unmake_move()
+    return counts
+
+
+# Runs every reference position up to the deepest depth whose count is at most max_nodes and prints one line per
+# count. Returns True if every count matched.
+def run_suite(max_nodes):
+    passed = True
+    total_nodes = 0
+    total_seconds = 0
+    for source, counts in REFERENCE:
+        for depth, expected in enumerate(counts, 1):
+            if expected > max_nodes: break
+            start = time.time()
+            nodes = perft(load_position(source), depth)
+            seconds = time.time() - start
+            total_nodes += nodes
+            total_seconds += seconds
+            status = "ok" if nodes == expected else f"FAILED, expected {expected}"
+            if nodes != expected: passed = False
+            print(f"{source} depth {depth}: {nodes} nodes {status}")
+    print(f"{'All counts matched' if passed else 'Some counts did not match'}, "
+          f"{total_nodes} nodes in {total_seconds:.2f}s ({int(total_nodes / max(total_seconds, 1e-9))} nps)")
+    return passed
+
+
+# Here is how to run the perft tool through the terminal:
+# --> python3 perft.py <depth> <(~optional) board_state or FEN> <(~optional) divide> <--
+# --> python3 perft.py suite <(~optional) max_nodes> <--
+# The first form counts the nodes of a single position (the default board if none is given), and prints the count of
+# every root move when "divide" is added. The second form runs the reference suite and exits with 1 if a count is off.
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) < 2:
+        print("For information on how to run perft.py in the terminal, refer to the comments at the end of the file.")
+        exit(1)
+    if sys.argv[1] == "suite":
+        exit(0 if run_suite(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000) else 1)
+    depth = int(sys.argv[1])
+    pos = load_position(sys.argv[2] if len(sys.argv) > 2 else "States/default.txt")
+    start = time.time()
+    if len(sys.argv) > 3 and sys.argv[3] == "divide":
+        counts = divide(pos, depth)
+        for move in sorted(counts, key=to_uci):
+            print(f"{to_uci(move)}: {counts[move]}")
+        nodes = sum(counts.values())
+    else:
+        nodes = perft(pos, depth)
+    seconds = time.time() - start
+    print(f"Nodes: {nodes}, {seconds:.2f}s, {int(nodes / max(seconds, 1e-9))} nps")
@@ -0,0 +1,95 @@
+import mmap
+import os
+import sys
+from bitboard import Position, PACKED_SIZE
+
+
+# Reads an EPD file (FEN files work too, their move counters are read as well), yielding the position and operations
+# of every line. Blank lines and lines starting with # are skipped.
+def read_epd(path):
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"): continue
+            fields = line.split()
+            if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+                yield Position.from_fen(line), {}
+            else:
+                yield Position.from_epd(line)
+
+
+# Writes (position, operations) pairs as an EPD file
+def write_epd(path, items):
+    with open(path, "w") as f:
+        for pos, ops in items:
+            f.write(pos.to_epd(ops) + "\n")
+
+
+# Writes positions back to back in the packed binary format of Position.pack and returns how many were written
+def write_packed(path, positions):
+    count = 0
+    with open(path, "wb") as f:
+        for pos in positions:
+            f.write(pos.pack())
+            count += 1
+    return count
+
+
+# Read-only view of a file of fixed size records. The file is memory-mapped rather than read, so opening it costs
+# nothing no matter how big it is and several processes reading the same file share the pages. PackedPositions and
+# the opening book (see OpeningBook in book.py) are both built on it.
+class MappedFile:
+    def __init__(self, path, record_size):
+        self._file = open(path, "rb")
+        self._size = os.path.getsize(path)
+        # An empty file can't be mapped, but then there's nothing to read anyway
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._size else b""
+        self._count = self._size // record_size
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        if self._size: self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Positions of a file written by write_packed. They're only unpacked when they're indexed or iterated over.
+class PackedPositions(MappedFile):
+    def __init__(self, path):
+        super().__init__(path, PACKED_SIZE)
+
+    def __getitem__(self, idx):
+        if idx < 0: idx += self._count
+        if not 0 <= idx < self._count: raise IndexError("packed position index out of range")
+        return Position.unpack(self._map, idx * PACKED_SIZE)
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield Position.unpack(self._map, idx * PACKED_SIZE)
+
+
+# Here is how to convert position sets through the terminal:
+# --> python3 positions.py pack <EPD or FEN file> <packed file> <--
+# --> python3 positions.py unpack <packed file> <(~optional) EPD file> <--
+# Unpacking without an output file prints the FEN of every position instead.
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ("pack", "unpack"):
+        print("For information on how to run positions.py in the terminal, refer to the readme file located in the folder.")
+        exit(1)
+    if sys.argv[1] == "pack":
+        count = write_packed(sys.argv[3], (pos for pos, _ in read_epd(sys.argv[2])))
+        print(f"Packed {count} positions into {count * PACKED_SIZE} bytes")
+    else:
+        with PackedPositions(sys.argv[2]) as packed:
+            if len(sys.argv) > 3:
+                write_epd(sys.argv[3], ((pos, {}) for pos in packed))
+            else:
+                for pos in packed:
+                    print(pos.to_fen())
@@ -0,0 +1,78 @@
+import pygame
+
+BACKGROUND_COLOR = (127, 190, 127, 255)
+HIGHLIGHT_COLOR = (255, 0, 255)
+
+# Draws the game onto the window. Everything that never changes (the background, the board and the rank and file
+# labels) is drawn once onto a cached background surface, and a single highlight square is shared by every legal
+# square. In dirty rectangle mode each frame is compared with the one before it: only the areas where something
+# appeared, disappeared, moved or changed are redrawn and passed to display.update, so nothing at all is drawn while
+# the mouse is still and nothing moves. Without it, every frame is redrawn in full and flipped.
+class Renderer:
+    def __init__(self, window, board, texts, turn_texts, dirty=True):
+        self._window = window
+        self._board = board
+        self._turn_texts = turn_texts
+        self._dirty = dirty
+        self._background = pygame.Surface(window.get_size()).convert()
+        self._background.fill(BACKGROUND_COLOR)
+        self._background.blit(board.get_surface(), board.get_tl())
+        for text in texts:
+            text.paste(self._background)
+        self._highlight = pygame.Surface((64, 64)).convert()
+        self._highlight.fill(HIGHLIGHT_COLOR)
+        self._highlight.set_alpha(128)
+        self._last = None # {key: (surface, rect)} of the last frame, None forces a full redraw
+
+    # Forces the next frame to be drawn in full, used when the window has to be repainted
+    def invalidate(self):
+        self._last = None
+
+    # Everything drawn on top of the background as (key, surface, rect), in drawing order
+    def _scene(self, legals, selected, cursor, status):
+        tl = self._board.get_tl()
+        text = self._turn_texts[self._board.turn % 2]
+        items = [("turn", text.get_image(), text.get_rect())]
+        if status is not None: items.append(("status", status.get_image(), status.get_rect()))
+        for coords in legals:
+            items.append((coords, self._highlight, pygame.Rect(tl[0] + coords[0] * 64, tl[1] + (7 - coords[1]) * 64, 64, 64)))
+        for player in self._board.PLAYERS:
+            for piece in player.get_owned():
+                if piece != selected:
+                    items.append((piece, piece.image, piece.rect.copy()))
+        if selected is not None:
+            items.append((selected, selected.image, selected.rect.copy()))
+        pos = pygame.mouse.get_pos()
+        items.append(("cursor", cursor, cursor.get_rect(topleft=(pos[0] - 3, pos[1] - 8))))
+        return items
+
+    # status is an optional Text shown below the board, such as what the AI is thinking about
+    def draw(self, legals, selected, cursor, status=None):
+        items = self._scene(legals, selected, cursor, status)
+        frame = {key: (surface, rect) for key, surface, rect in items}
+        if not self._dirty or self._last is None:
+            self._window.blit(self._background, (0, 0))
+            for _, surface, rect in items:
+                self._window.blit(surface, rect)
+            pygame.display.flip()
+            self._last = frame
+            return
+        dirty = []
+        for key, (surface, rect) in frame.items():
+            old = self._last.get(key)
+            if old is None or old[0] is not surface or old[1] != rect:
+                dirty.append(rect)
+                if old is not None: dirty.append(old[1])
+        for key, (_, rect) in self._last.items():
+            if key not in frame: dirty.append(rect)
+        self._last = frame
+        if not dirty: return
+        # Each area is repainted from the background up while clipped to it, so the parts of sprites that stick out
+        # of it (and their see-through edges) aren't drawn twice.
+        for area in dirty:
+            self._window.set_clip(area)
+            self._window.blit(self._background, area, area)
+            for _, surface, rect in items:
+                if rect.colliderect(area): self._window.blit(surface, rect)
+        self._window.set_clip(None)
+        pygame.display.update(dirty)
@@ -0,0 +1,611 @@
+import time
+from bitboard import *
+from evaluate import evaluate
+from tablebase import WIN, LOSS
+
+MATE = 100000.0 # Score of a checkmate, the number of plies to the mate is subtracted so shorter mates score higher
+INFINITY = 1000000.0
+MAX_PLY = 128
+
+# Bound types of transposition table scores
+EXACT = 0
+LOWER = 1 # The search failed high, the real score is at least this
+UPPER = 2 # The search failed low, the real score is at most this
+
+
+# Fixed-size transposition table indexed by the low bits of the Zobrist hash. Each slot holds a single entry of
+# (hash, depth, score, bound, best move, generation). An entry is only replaced by one from a shallower search if it
+# was stored during an earlier search, so the deepest (most expensive) results stick around.
+class TranspositionTable:
+    def __init__(self, size=1 << 18):
+        self._mask = size - 1 # size must be a power of two
+        self._entries = [None] * size
+        self._generation = 0
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_size(self):
+        return self._mask + 1
+
+    def clear(self):
+        self._entries = [None] * (self._mask + 1)
+        self.used = 0
+
+    # Called at the start of every search so entries from earlier searches can be told apart
+    def new_search(self):
+        self._generation += 1
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        entry = self._entries[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        idx = key & self._mask
+        old = self._entries[idx]
+        if old is None:
+            self.used += 1
+        elif old[5] == self._generation and old[1] > depth:
+            return
+        self._entries[idx] = (key, depth, score, bound, move, self._generation)
+
+    # Fraction of slots in use, in permille as the UCI hashfull info expects it
+    def hashfull(self):
+        return self.used * 1000 // (self._mask + 1)
+
+
+# Mate scores count plies from the root, but a table entry can be reached at any ply. They are stored relative to the
+# node they were found at and turned back into distance from the root when they are read.
+def score_to_tt(score, ply):
+    if score >= MATE - MAX_PLY: return score + ply
+    if score <= -MATE + MAX_PLY: return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score >= MATE - MAX_PLY: return score - ply
+    if score <= -MATE + MAX_PLY: return score + ply
+    return score
+
+
+# Score of an exact tablebase result of (result, plies to mate) found at the given ply, on the same scale as the
+# checkmates found by the search itself
+def tablebase_score(result, ply):
+    if result[0] == WIN: return MATE - ply - result[1]
+    if result[0] == LOSS: return -MATE + ply + result[1]
+    return 0
+
+
+# A capture is skipped in the quiescence search when even winning the captured piece for free plus this margin can't
+# bring the score back up to alpha (delta pruning)
+DELTA_MARGIN = 30
+
+# Attacker values for MVV-LVA. Same as the piece-point values of eval_board except the king, which eval_board gives no
+# value but which should be the last piece to make a capture with.
+ATTACKER_VALUES = [100] + PIECE_VALUES[1:]
+
+# Width of the null window used to test whether a move beats the best score so far. Scores move in steps of 0.05 at
+# the finest, so no score fits strictly inside a window this narrow.
+NULL_WINDOW = 0.01
+
+# Half-width of the aspiration window put around the previous iteration's score, and how much it grows every time
+# the score falls outside it. Once it's wider than ASPIRATION_MAX the window is opened all the way on that side.
+ASPIRATION_WINDOW = 5
+ASPIRATION_GROWTH = 4
+ASPIRATION_MAX = 300
+
+# Null-move pruning: the side to move passes and the opponent gets a search NULL_MOVE_REDUCTION plies shallower than
+# usual (one more from NULL_MOVE_DEEP_DEPTH on). If passing still scores at least beta, so will some real move. That
+# is wrong in zugzwang, where passing would be the best move, so from NULL_MOVE_VERIFY_DEPTH on the cutoff is only
+# taken once a search of the node's real moves, just as much shallower and without passing, agrees.
+NULL_MOVE_MIN_DEPTH = 2
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 6
+NULL_MOVE_VERIFY_DEPTH = 4
+
+# Late move reductions: quiet moves from the LMR_MIN_MOVES-th on are searched a ply shallower at depths of at least
+# LMR_MIN_DEPTH, two plies from the LMR_LATE_MOVES-th on, and a ply less than that if their history score is at least
+# LMR_GOOD_HISTORY. Any that beat alpha anyway are searched again at the full depth.
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_LATE_MOVES = 8
+LMR_GOOD_HISTORY = 64
+
+# Futility pruning: at the last FUTILITY_DEPTH plies, quiet moves other than the first are skipped when the static
+# evaluation plus FUTILITY_MARGIN per ply left can't reach alpha
+FUTILITY_DEPTH = 2
+FUTILITY_MARGIN = 30
+
+# Razoring: at the last RAZOR_DEPTH plies, a node whose static evaluation plus RAZOR_MARGIN per ply left is below
+# alpha only gets a quiescence search and a look at its checks, unless those find a way back above alpha. Only the
+# last ply is razored, deeper down a mate could be hidden behind a move that isn't a check.
+RAZOR_DEPTH = 1
+RAZOR_MARGIN = 40
+
+# Sort key bands of MoveOrder, from first to last: table move, captures and promotions, killers and quiet moves
+TT_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 24
+KILLER_SCORE = 1 << 22
+HISTORY_MAX = 1 << 20
+
+
+# Puts moves into the order they are most likely to cause a cutoff in: the move from the transposition table (which
+# holds the previous iteration's best move), then captures by most valuable victim / least valuable attacker, then
+# the two killer moves of the ply (quiet moves that caused a cutoff in a sibling node) and finally the rest of the
+# quiet moves by their history score, which grows every time the same piece moving to the same square causes a cutoff.
+class MoveOrder:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        self.history = [[0] * 64 for _ in range(12)]
+
+    # Killers only make sense within one search, history is kept but halved so older results count for less
+    def new_search(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)]
+        for row in self.history:
+            for sq in range(64):
+                row[sq] >>= 1
+
+    def is_quiet(self, pos, move):
+        return pos.squares[(move >> 6) & 63] is None and not move >> 12 and\
+            not (pos.squares[move & 63] >> 1 == PAWN and (move >> 6) & 63 == pos.ep)
+
+    def score(self, pos, move, tt_move, killers):
+        if move == tt_move: return TT_MOVE_SCORE
+        squares = pos.squares
+        to = (move >> 6) & 63
+        attacker = squares[move & 63] >> 1
+        victim = squares[to]
+        if victim is not None:
+            return CAPTURE_SCORE + PIECE_VALUES[victim >> 1] * 1000 + PIECE_VALUES[move >> 12] * 1000 -\
+                ATTACKER_VALUES[attacker]
+        if move >> 12:
+            return CAPTURE_SCORE + PIECE_VALUES[move >> 12] * 1000 - ATTACKER_VALUES[attacker]
+        if attacker == PAWN and to == pos.ep:
+            return CAPTURE_SCORE + PIECE_VALUES[PAWN] * 1000 - ATTACKER_VALUES[PAWN]
+        if move == killers[0]: return KILLER_SCORE + 1
+        if move == killers[1]: return KILLER_SCORE
+        return self.history[squares[move & 63]][to]
+
+    def order(self, pos, moves, tt_move, ply):
+        killers = self.killers[ply]
+        scored = [(self.score(pos, move, tt_move, killers), move) for move in moves]
+        scored.sort(reverse=True)
+        return [move for _, move in scored]
+
+    # Yields the legal moves of the position in the same order as order(), but generates them in stages as they are
+    # asked for: the best guess move (usually from the transposition table) first, then the captures and promotions,
+    # then the killers and last the quiet moves. The best guess and the killers are checked with Position.is_legal
+    # rather than generated, so a node that cuts off on one of them never generates any moves at all. The position
+    # has to be back the way it was every time the next move is asked for.
+    def staged(self, pos, best_guess, ply):
+        if best_guess is not None and pos.is_legal(best_guess): yield best_guess
+        else: best_guess = None
+        no_killers = (None, None)
+        scored = [(self.score(pos, move, None, no_killers), move) for move in pos.legal_moves(True)
+                  if move != best_guess]
+        scored.sort(reverse=True)
+        for _, move in scored:
+            yield move
+        killers = self.killers[ply]
+        played = [best_guess]
+        for killer in killers:
+            if killer is not None and killer not in played and pos.is_legal(killer) and self.is_quiet(pos, killer):
+                played.append(killer)
+                yield killer
+        squares = pos.squares
+        history = self.history
+        scored = [(history[squares[move & 63]][(move >> 6) & 63], move) for move in pos.legal_moves(quiets=True)
+                  if move not in played]
+        scored.sort(reverse=True)
+        for _, move in scored:
+            yield move
+
+    # Called when a move caused a beta cutoff at the given depth and ply
+    def add_cutoff(self, pos, move, depth, ply):
+        if not self.is_quiet(pos, move): return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        row = self.history[pos.squares[move & 63]]
+        row[(move >> 6) & 63] += depth * depth
+        if row[(move >> 6) & 63] >= HISTORY_MAX:
+            for history_row in self.history:
+                for sq in range(64):
+                    history_row[sq] >>= 1
+
+
+# Negamax alpha-beta search over a bitboard Position with iterative deepening. The search can be limited by depth, by
+# a deadline in milliseconds and by a number of nodes. When a limit runs out in the middle of an iteration that
+# iteration is thrown away and the best move of the deepest iteration that finished is returned.
+#
+# With pvs set the search is a principal variation search: only the first move of a node gets the full window, the
+# rest are searched with a null window around alpha, which only proves they are no better, and searched again with
+# the full window when one turns out to be. With aspiration set each iteration starts with a narrow window around the
+# score of the one before, which is widened and searched again whenever the score falls outside it. The best line of
+# each node is collected in a triangular table, so the whole principal variation of the last iteration is known.
+#
+# Away from the principal variation the search is selective, with null-move pruning, late move reductions, futility
+# pruning and razoring, each of which can be turned off on its own to measure what it does. None of them are used
+# when the side to move is in check, and null moves are never tried by a side with nothing but pawns left, where
+# being forced to move (zugzwang) is common and passing would be better than any real move.
+#
+# With lazy_eval set, positions are scored with the lazy evaluation, which returns a real bound instead of the score
+# when the score is bound to be outside the window (see evaluate), so the pruning decisions come out the same. Working
+# out the bound costs about as much as the full evaluation saves, so it's off by default.
+class Search:
+    def __init__(self, tt_size=1 << 18, lazy_eval=False, tablebase=None, pvs=True, aspiration=True, null_move=True,
+                 lmr=True, futility=True, razoring=True):
+        self.tt = TranspositionTable(tt_size)
+        self.ordering = MoveOrder()
+        self.lazy_eval = lazy_eval
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.null_move = null_move
+        self.lmr = lmr
+        self.futility = futility
+        self.razoring = razoring
+        self.pv_table = [[] for _ in range(MAX_PLY + 2)] # Best line found from each ply of the current node
+        self.pv = [] # Principal variation of the deepest iteration that finished
+        self._pv_key = None # Hash of the position self.pv starts from
+        self.researches = 0 # Null window searches that had to be searched again with the full window
+        self.aspiration_researches = 0 # Iterations searched again because the score fell outside the window
+        self.null_cutoffs = 0 # Nodes cut off by a null move
+        self.reductions = 0 # Moves searched with a late move reduction
+        self.futility_prunes = 0 # Moves skipped by futility pruning
+        self.razor_cutoffs = 0 # Nodes cut off by razoring
+        self.tablebase = tablebase # Optional Tablebase, positions it covers get their exact score without searching
+        self.tb_hits = 0 # Positions scored by the tablebase during the last search
+        self.cutoffs = 0 # Beta cutoffs during the last search
+        self.first_cutoffs = 0 # Beta cutoffs that happened on the first move searched
+        self.nodes = 0 # Nodes of the main search
+        self.qnodes = 0 # Nodes of the quiescence search, counted separately
+        self.depth = 0 # Deepest iteration that finished during the last search
+        self.score = 0
+        self._deadline = None
+        self._max_nodes = None
+        self._stopped = False
+        self._start = time.time()
+        self.stop_event = None # Optional threading/multiprocessing Event that stops the search when set
+
+    # Can be called from another thread to make a running search return as soon as possible
+    def stop(self):
+        self._stopped = True
+
+    # Fraction of beta cutoffs caused by the first move searched, the closer to 1 the better the move ordering
+    def first_cutoff_rate(self):
+        return self.first_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    # Can be called from another thread while a search is running, as a time.time() value
+    def set_deadline(self, deadline):
+        self._deadline = deadline
+
+    def elapsed(self):
+        return time.time() - self._start
+
+    def check_limits(self):
+        nodes = self.nodes + self.qnodes
+        if self._max_nodes is not None and nodes >= self._max_nodes:
+            self._stopped = True
+        elif nodes & 255 == 0:
+            if self._deadline is not None and time.time() >= self._deadline or\
+                    self.stop_event is not None and self.stop_event.is_set():
+                self._stopped = True
+
+    # The line the search expects to be played from the position. That's the principal variation of the last search
+    # if it was from this position, otherwise the best moves stored in the transposition table are followed, stopping
+    # at the first missing or illegal move and before any position repeats.
+    def principal_variation(self, pos, length=MAX_PLY):
+        if pos.hash == self._pv_key and self.pv: return self.pv[:length]
+        line = []
+        seen = set()
+        while len(line) < length and pos.hash not in seen:
+            seen.add(pos.hash)
+            entry = self.tt.probe(pos.hash)
+            if entry is None or entry[4] is None or entry[4] not in pos.legal_moves(): break
+            pos.make_move(entry[4])
+            line.append(entry[4])
+        for _ in line:
+            pos.unmake_move()
+        return line
+
+    # Resets the counters and limits before a new search. The time limit can be given either as movetime in
+    # milliseconds from now or as an absolute deadline from time.time(). With fresh unset the transposition table
+    # generation, killers and history are left alone, for when several calls make up the same search.
+    def start(self, movetime=None, nodes=None, deadline=None, fresh=True):
+        self.nodes = 0
+        self.qnodes = 0
+        self.depth = 0
+        self.score = 0
+        self.cutoffs = 0
+        self.first_cutoffs = 0
+        self.tb_hits = 0
+        self.researches = 0
+        self.aspiration_researches = 0
+        self.null_cutoffs = 0
+        self.reductions = 0
+        self.futility_prunes = 0
+        self.razor_cutoffs = 0
+        self._stopped = False
+        self._start = time.time()
+        self._deadline = self._start + movetime / 1000 if movetime is not None else deadline
+        self._max_nodes = nodes
+        if fresh:
+            self.tt.new_search()
+            self.ordering.new_search()
+
+    def is_stopped(self):
+        return self._stopped
+
+    # Searches one iteration deeper each time until a limit runs out. nodes limits the main and quiescence nodes
+    # together. report, if given, is called with (depth, score, best move, nodes, seconds) after every finished
+    # iteration, where nodes again counts both, and self.pv holds the iteration's principal variation by then.
+    # Returns None when there are no moves.
+    def iterate(self, pos, depth=MAX_PLY, movetime=None, nodes=None, report=None):
+        self.start(movetime, nodes)
+        self.pv = []
+        self._pv_key = pos.hash
+        moves = pos.legal_moves()
+        if not moves: return None
+        # Positions the tablebase covers are already solved, so its best move is played straight away
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(pos)
+            if move is not None:
+                self.score = tablebase_score(self.tablebase.probe(pos), 0)
+                self.pv = [move]
+                if report is not None: report(0, self.score, move, 0, self.elapsed())
+                return move
+        best_move = moves[0]
+        entry = self.tt.probe(pos.hash)
+        if entry is not None and entry[4] in moves: best_move = entry[4]
+        for d in range(1, depth + 1):
+            score, move = self.search_aspiration(pos, moves, best_move, d)
+            if self._stopped and d > 1: break
+            best_move = move
+            self.depth = d
+            self.score = score
+            self.pv = list(self.pv_table[0]) or [move]
+            if report is not None: report(d, score, move, self.nodes + self.qnodes, self.elapsed())
+            if self._stopped or len(moves) == 1 or abs(score) >= MATE - MAX_PLY: break
+        return best_move
+
+    # Searches one iteration, starting with a window of ASPIRATION_WINDOW either side of the last iteration's score.
+    # Each time the score falls outside it, the window is made ASPIRATION_GROWTH times wider on that side and the
+    # iteration is searched again, after a fail high with the move that failed high first.
+    def search_aspiration(self, pos, moves, first, depth):
+        alpha = -INFINITY
+        beta = INFINITY
+        window = ASPIRATION_WINDOW
+        if self.aspiration and depth > 1 and abs(self.score) < MATE - MAX_PLY:
+            alpha = self.score - window
+            beta = self.score + window
+        while True:
+            score, move = self.search_root(pos, moves, first, depth, alpha, beta)
+            if self._stopped or alpha < score < beta: return score, move
+            self.aspiration_researches += 1
+            window *= ASPIRATION_GROWTH
+            if score <= alpha:
+                alpha = score - window if window < ASPIRATION_MAX else -INFINITY
+            else:
+                beta = score + window if window < ASPIRATION_MAX else INFINITY
+                first = move
+
+    # The root is searched like any other node except that the best move is tracked and last iteration's best move
+    # is searched first, so a partly finished iteration has always looked at it.
+    def search_root(self, pos, moves, first, depth, alpha=-INFINITY, beta=INFINITY):
+        alpha_orig = alpha
+        best = -INFINITY
+        best_move = first
+        self.pv_table[0] = []
+        for idx, move in enumerate(self.ordering.order(pos, moves, first, 0)):
+            pos.make_move(move)
+            if idx == 0 or not self.pvs:
+                score = -self.alpha_beta_prune(pos, depth - 1, -beta, -alpha, 1)
+            else:
+                score = -self.alpha_beta_prune(pos, depth - 1, -alpha - NULL_WINDOW, -alpha, 1)
+                if alpha < score < beta:
+                    self.researches += 1
+                    score = -self.alpha_beta_prune(pos, depth - 1, -beta, -alpha, 1)
+            pos.unmake_move()
+            if self._stopped: break
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    self.pv_table[0] = [move] + self.pv_table[1]
+                    if alpha >= beta: break
+        if not self._stopped:
+            if best >= beta: bound = LOWER
+            elif best > alpha_orig: bound = EXACT
+            else: bound = UPPER
+            self.tt.store(pos.hash, depth, score_to_tt(best, 0), bound, best_move)
+        return best, best_move
+
+# Alpha-Beta Pruning is a more complex form of minimaxing that can disregard branches in the move tree that are known to
+# be obsolete, either by showing the opponent has a worse outcome down the tree or that you will have a better outcome
+# down the tree. It always plays in expectation that the opponent will make the moves that benefit you the least and
+# continues to make the best possible move based on that scenario.
+
+# This is the negamax form of it: every score is given from the point of view of the side to move, so the score of a
+# move is the negated score of the position it leads to from the opponent's point of view, and alpha and beta swap and
+# change sign on the way down. Alpha is the best score the side to move is already sure of and beta is the best score
+# the opponent is sure of, so as soon as a move scores at least beta the opponent will never allow this position and
+# the rest of the moves don't need to be looked at.
+    def alpha_beta_prune(self, pos, depth, alpha, beta, ply, allow_null=True):
+        self.nodes += 1
+        self.pv_table[ply] = []
+        self.check_limits()
+        if self._stopped: return 0
+        if pos.halfmove >= 100 or pos.is_repetition(): return 0
+        if self.tablebase is not None and popcount(pos.all_occupied()) <= self.tablebase.max_pieces:
+            result = self.tablebase.probe(pos)
+            if result is not None:
+                self.tb_hits += 1
+                return tablebase_score(result, ply)
+        if depth <= 0: return self.quiesce(pos, alpha, beta, ply)
+        if ply >= MAX_PLY: return evaluate(pos, alpha, beta, self.lazy_eval)
+        # Nodes searched with more than a null window can end up on the principal variation, which is kept whole by
+        # never cutting them short with a table score. Windows are worked out in floating point, so a null window can
+        # come out a little wider than NULL_WINDOW and is only told apart from a real one with some room to spare.
+        pv_node = beta - alpha > NULL_WINDOW * 1.5
+        entry = self.tt.probe(pos.hash)
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[4]
+            if entry[1] >= depth and not pv_node:
+                score = score_from_tt(entry[2], ply)
+                bound = entry[3]
+                if bound == EXACT or bound == LOWER and score >= beta or bound == UPPER and score <= alpha:
+                    return score
+        in_check = pos.in_check(pos.side)
+        selective = not pv_node and not in_check and abs(alpha) < MATE - MAX_PLY
+        static = evaluate(pos, alpha, beta, self.lazy_eval) if selective else 0
+        if selective and self.razoring and depth <= RAZOR_DEPTH and static + RAZOR_MARGIN * depth <= alpha:
+            score = self.quiesce(pos, alpha, beta, ply)
+            if score <= alpha: score = max(score, self.checks(pos, alpha, beta, ply))
+            if self._stopped: return 0
+            if score <= alpha:
+                self.razor_cutoffs += 1
+                return score
+        if selective and self.null_move and allow_null and depth >= NULL_MOVE_MIN_DEPTH and static >= beta:
+            side = pos.side
+            pieces = pos.pieces
+            if pieces[QUEEN * 2 + side] | pieces[ROOK * 2 + side] | pieces[KNIGHT * 2 + side] |\
+                    pieces[BISHOP * 2 + side]:
+                reduction = NULL_MOVE_REDUCTION + (depth >= NULL_MOVE_DEEP_DEPTH)
+                pos.make_null_move()
+                score = -self.alpha_beta_prune(pos, depth - 1 - reduction, -beta, -beta + NULL_WINDOW, ply + 1, False)
+                pos.unmake_null_move()
+                if self._stopped: return 0
+                if score >= beta and depth >= NULL_MOVE_VERIFY_DEPTH:
+                    score = self.alpha_beta_prune(pos, depth - reduction, beta - NULL_WINDOW, beta, ply, False)
+                    if self._stopped: return 0
+                if score >= beta:
+                    self.null_cutoffs += 1
+                    # A mate found after passing isn't a real one
+                    return beta if score >= MATE - MAX_PLY else score
+        prune_quiets = selective and self.futility and depth <= FUTILITY_DEPTH and\
+            static + FUTILITY_MARGIN * depth <= alpha
+        reduce = selective and self.lmr and depth >= LMR_MIN_DEPTH
+        history = self.ordering.history
+        alpha_orig = alpha
+        best = -INFINITY
+        best_move = None
+        for idx, move in enumerate(self.ordering.staged(pos, tt_move, ply)):
+            late = idx >= LMR_MIN_MOVES and reduce
+            quiet = (prune_quiets and idx > 0 or late) and self.ordering.is_quiet(pos, move)
+            good_history = quiet and late and history[pos.squares[move & 63]][(move >> 6) & 63] >= LMR_GOOD_HISTORY
+            pos.make_move(move)
+            # Moves that give check are never pruned or reduced
+            if quiet and pos.in_check(pos.side): quiet = False
+            if quiet and prune_quiets and idx > 0:
+                pos.unmake_move()
+                self.futility_prunes += 1
+                # The skipped move could have scored up to the margin, which keeps the score a valid bound
+                best = max(best, static + FUTILITY_MARGIN * depth)
+                continue
+            reduction = 0
+            if quiet and late:
+                reduction = min(1 + (idx >= LMR_LATE_MOVES) - good_history, depth - 2)
+            if reduction > 0:
+                self.reductions += 1
+                score = -self.alpha_beta_prune(pos, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, ply + 1)
+            if reduction <= 0 or score > alpha:
+                if idx == 0 or not self.pvs or not pv_node:
+                    score = -self.alpha_beta_prune(pos, depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    score = -self.alpha_beta_prune(pos, depth - 1, -alpha - NULL_WINDOW, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        self.researches += 1
+                        score = -self.alpha_beta_prune(pos, depth - 1, -beta, -alpha, ply + 1)
+            pos.unmake_move()
+            if self._stopped: return 0
+            if score > best:
+                best = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if pv_node: self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                    if alpha >= beta:
+                        self.cutoffs += 1
+                        if idx == 0: self.first_cutoffs += 1
+                        self.ordering.add_cutoff(pos, move, depth, ply)
+                        break
+        # No move was searched, so there are none: checkmate or stalemate
+        if best_move is None:
+            return -MATE + ply if in_check else 0
+        if best >= beta: bound = LOWER
+        elif best > alpha_orig: bound = EXACT
+        else: bound = UPPER
+        self.tt.store(pos.hash, depth, score_to_tt(best, ply), bound, best_move)
+        return best
+
+    # Best score of the moves that give check, each answered by a quiescence search. Razoring runs it after the
+    # quiescence search, which only tries captures and skips the ones that look like they lose material, so a mate is
+    # never razored away, whether it's a quiet move or a capture of a defended piece.
+    def checks(self, pos, alpha, beta, ply):
+        best = -INFINITY
+        for move in pos.legal_moves():
+            pos.make_move(move)
+            if pos.in_check(pos.side):
+                score = -self.quiesce(pos, -beta, -alpha, ply + 1)
+                if score > best:
+                    best = score
+                    if score > alpha: alpha = score
+            pos.unmake_move()
+            if self._stopped or alpha >= beta: break
+        return best
+
+    # Quiescence search, run at the leaves of the main search so positions are only scored once no captures are left
+    # hanging. The side to move can always "stand pat" and take the static evaluation instead of capturing, which is
+    # the lower bound of the node. Captures are searched most valuable victim first, and the ones that can't raise the
+    # score to alpha even if the captured piece is won for free are skipped, as are captures of a defended piece by a
+    # more valuable one, which lose material. When in check every evasion is searched since standing pat isn't an
+    # option.
+    def quiesce(self, pos, alpha, beta, ply):
+        self.qnodes += 1
+        self.check_limits()
+        if self._stopped: return 0
+        in_check = pos.in_check(pos.side)
+        if ply >= MAX_PLY: return evaluate(pos, alpha, beta, self.lazy_eval)
+        if in_check:
+            moves = pos.legal_moves()
+            if not moves: return -MATE + ply
+            best = -INFINITY
+        else:
+            best = evaluate(pos, alpha, beta, self.lazy_eval)
+            if best >= beta: return best
+            if best > alpha: alpha = best
+            moves = pos.legal_moves(True)
+        squares = pos.squares
+        occ = pos.occupied[0] | pos.occupied[1]
+        # The most a capture skipped by delta pruning could have scored, which still has to be an upper bound of the
+        # node when every move fails low so the score can be trusted outside the window (alpha, beta) as well
+        pruned = -INFINITY
+        for move in self.ordering.order(pos, moves, None, ply):
+            if not in_check:
+                to = (move >> 6) & 63
+                victim = squares[to]
+                gain = PIECE_VALUES[victim >> 1] if victim is not None else PIECE_VALUES[PAWN]
+                if move >> 12: gain += PIECE_VALUES[move >> 12] - PIECE_VALUES[PAWN]
+                if best + gain + DELTA_MARGIN <= alpha:
+                    pruned = max(pruned, best + gain + DELTA_MARGIN)
+                    continue
+                if ATTACKER_VALUES[squares[move & 63] >> 1] > gain and pos.attackers(to, pos.side ^ 1, occ): continue
+            pos.make_move(move)
+            score = -self.quiesce(pos, -beta, -alpha, ply + 1)
+            pos.unmake_move()
+            if self._stopped: return 0
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta: break
+        return max(best, pruned)
@@ -0,0 +1,163 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from bitboard import *
+from search import Search
+from tablebase import Tablebase, TABLE_DIR, WIN, LOSS
+
+
+SEARCH_LIMITS = ("depth", "movetime", "nodes") # Passed on to Search.iterate
+# Passed on to Search itself, 0 turns the technique off and 1 on
+SEARCH_OPTIONS = ("pvs", "aspiration", "null_move", "lmr", "futility", "razoring")
+
+
+# Search settings are given as comma separated limits and options, such as "depth=3", "movetime=200,depth=6" or
+# "movetime=200,pvs=0"
+def parse_settings(text):
+    settings = {}
+    for part in text.split(","):
+        key, value = part.split("=")
+        if key not in SEARCH_LIMITS and key not in SEARCH_OPTIONS:
+            raise ValueError(f"Unknown search setting: {key}")
+        settings[key] = int(value)
+    return settings
+
+
+# Splits settings from parse_settings into the keyword arguments of Search.iterate and of Search
+def split_settings(settings):
+    limits = {key: value for key, value in settings.items() if key in SEARCH_LIMITS}
+    options = {key: bool(value) for key, value in settings.items() if key in SEARCH_OPTIONS}
+    return limits, options
+
+
+# Plays one engine vs engine game from the given save file without any GUI and returns a dict describing it. Each
+# side has its own Search so their transposition tables don't help each other. The game ends on checkmate,
+# stalemate, the fifty-move rule, threefold repetition or once each side has played max_moves moves. With tablebases, it
+# also ends as soon as the position is in one, with the exact result the tables give.
+def play_game(game_id, opening, white_settings, black_settings, max_moves, tablebase_dir=None):
+    with open(opening, "r") as f:
+        pos = Position.from_state(f.read())
+    tablebase = Tablebase(tablebase_dir) if tablebase_dir is not None else None
+    settings = [split_settings(white_settings), split_settings(black_settings)]
+    searches = [Search(**settings[WHITE][1]), Search(**settings[BLACK][1])]
+    seen = {pos.hash: 1}
+    nodes = [0, 0]
+    qnodes = [0, 0]
+    cutoffs = [0, 0]
+    first_cutoffs = [0, 0]
+    depths = [0, 0]
+    researches = [0, 0]
+    seconds = [0.0, 0.0]
+    played = 0
+    result = "1/2-1/2"
+    reason = "move cap"
+    while played < 2 * max_moves:
+        if not pos.legal_moves():
+            if pos.in_check(pos.side):
+                result = "0-1" if pos.side == WHITE else "1-0"
+                reason = "checkmate"
+            else:
+                reason = "stalemate"
+            break
+        if pos.halfmove >= 100:
+            reason = "fifty-move rule"
+            break
+        if seen[pos.hash] >= 3:
+            reason = "threefold repetition"
+            break
+        known = tablebase.probe(pos) if tablebase is not None else None
+        if known is not None:
+            if known[0] == WIN: result = "1-0" if pos.side == WHITE else "0-1"
+            elif known[0] == LOSS: result = "0-1" if pos.side == WHITE else "1-0"
+            reason = "tablebase"
+            break
+        side = pos.side
+        start = time.time()
+        move = searches[side].iterate(pos, **settings[side][0])
+        seconds[side] += time.time() - start
+        nodes[side] += searches[side].nodes
+        qnodes[side] += searches[side].qnodes
+        cutoffs[side] += searches[side].cutoffs
+        first_cutoffs[side] += searches[side].first_cutoffs
+        depths[side] += searches[side].depth
+        researches[side] += searches[side].researches + searches[side].aspiration_researches
+        pos.make_move(move)
+        seen[pos.hash] = seen.get(pos.hash, 0) + 1
+        played += 1
+    return {"game": game_id, "opening": opening, "result": result, "reason": reason, "moves": (played + 1) // 2,
+            "nodes": nodes, "qnodes": qnodes, "seconds": seconds, "depths": depths, "researches": researches,
+            "cutoffs": cutoffs, "first_cutoffs": first_cutoffs, "plies": [(played + 1) // 2, played // 2]}
+
+
+# Plays games engine A vs engine B across a pool of worker processes. A plays white in the even numbered games and
+# black in the odd ones. Openings are used in turn. Results are printed as soon as each game finishes, followed by
+# a summary from A's point of view.
+def run(games, openings, settings_a, settings_b, max_moves, workers, tablebase_dir=None):
+    wins = draws = losses = 0
+    total_moves = 0
+    nodes = [0, 0] # [A, B]
+    qnodes = [0, 0]
+    cutoffs = [0, 0]
+    first_cutoffs = [0, 0]
+    seconds = [0.0, 0.0]
+    depths = [0, 0]
+    researches = [0, 0]
+    plies = [0, 0]
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for game_id in range(games):
+            a_white = game_id % 2 == 0
+            white, black = (settings_a, settings_b) if a_white else (settings_b, settings_a)
+            future = pool.submit(play_game, game_id, openings[game_id % len(openings)], white, black, max_moves,
+                                 tablebase_dir)
+            futures[future] = a_white
+        for future in as_completed(futures):
+            game = future.result()
+            a_white = futures[future]
+            a = WHITE if a_white else BLACK
+            if game["result"] == "1/2-1/2": draws += 1
+            elif (game["result"] == "1-0") == a_white: wins += 1
+            else: losses += 1
+            total_moves += game["moves"]
+            for idx, color in enumerate((a, a ^ 1)):
+                nodes[idx] += game["nodes"][color]
+                qnodes[idx] += game["qnodes"][color]
+                cutoffs[idx] += game["cutoffs"][color]
+                first_cutoffs[idx] += game["first_cutoffs"][color]
+                seconds[idx] += game["seconds"][color]
+                depths[idx] += game["depths"][color]
+                researches[idx] += game["researches"][color]
+                plies[idx] += game["plies"][color]
+            print(f"Game {game['game']} ({os.path.basename(game['opening'])}, A {'white' if a_white else 'black'}): "
+                  f"{game['result']} by {game['reason']} after {game['moves']} moves | "
+                  f"A +{wins} ={draws} -{losses}", flush=True)
+    finished = wins + draws + losses
+    print(f"A vs B: +{wins} ={draws} -{losses} over {finished} games, {total_moves / max(finished, 1):.1f} moves per game")
+    for idx, name in enumerate(("A", "B")):
+        per_move = max(plies[idx], 1)
+        print(f"{name}: {nodes[idx] / per_move:.0f} nodes, {qnodes[idx] / per_move:.0f} quiescence nodes, "
+              f"{seconds[idx] / per_move * 1000:.0f} ms, depth {depths[idx] / per_move:.1f} and "
+              f"{researches[idx] / per_move:.1f} re-searches per move, "
+              f"{first_cutoffs[idx] / max(cutoffs[idx], 1):.0%} of cutoffs on the first move")
+    return wins, draws, losses
+
+
+# Here is how to run batch self-play through the terminal, for example to tune the eval_board weights:
+# --> python3 selfplay.py <games> <(~optional) flags> <--
+# --openings takes one or more save files (default: every file in States), --a and --b take the search settings of
+# the two engines (default: depth=2, see parse_settings), --max-moves caps the number of moves each side plays and --workers sets
+# the number of processes.
+# Games are adjudicated by the tablebases in --tablebases (default: the Tablebases folder, if there is one).
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plays engine vs engine games without the GUI.")
+    parser.add_argument("games", type=int)
+    parser.add_argument("--openings", nargs="+", default=sorted(glob.glob("States/*.txt")))
+    parser.add_argument("--a", type=parse_settings, default={"depth": 2})
+    parser.add_argument("--b", type=parse_settings, default={"depth": 2})
+    parser.add_argument("--max-moves", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--tablebases", default=TABLE_DIR if os.path.isdir(TABLE_DIR) else None)
+    args = parser.parse_args()
+    run(args.games, args.openings, args.a, args.b, args.max_moves, args.workers, args.tablebases)
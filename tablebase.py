@@ -0,0 +1,385 @@
+import mmap
+import os
+import sys
+import time
+from array import array
+from bitboard import *
+
+# Endgame tablebases: every position of a small set of pieces solved exactly by retrograde analysis, working backwards
+# from the checkmates. Each table is stored as two files, a .wdl file with the win/draw/loss result for the side to move
+# packed four positions to a byte and a .dtm file with the distance to mate in plies, one byte per position.
+# Tables assume there are no castling rights or en passant squares, which can't matter once so few pieces are left.
+
+TABLE_DIR = "Tablebases"
+MAX_PIECES = 4
+DEFAULT_TABLES = ("KQK", "KRK", "KPK")
+KIND_LETTERS = "KQRNBP" # Indexed by kind of piece, the letters used in table names
+
+# Results for the side to move. INVALID marks indices that aren't a legal position (two pieces on one square, a pawn on
+# the first or last rank, or the side that just moved left in check).
+INVALID = 0
+LOSS = 1
+DRAW = 2
+WIN = 3
+
+
+# Table name of a material set, such as "KQK" or "KRKP". The stronger side is always written first as white, the
+# second value tells whether the colors of the position have to be swapped to match the table.
+def table_name(types):
+    sides = ["", ""]
+    for p_type in sorted(types, key=lambda p_type: p_type // 2):
+        sides[p_type % 2] += KIND_LETTERS[p_type // 2]
+    strength = [(len(side), sum(PIECE_VALUES[KIND_LETTERS.index(char)] for char in side), side) for side in sides]
+    if strength[0] >= strength[1]: return sides[0] + sides[1], False
+    return sides[1] + sides[0], True
+
+
+# Piece types of a table in the order of its index, white pieces first and the two kings leading each side
+def table_types(name):
+    split = name.index("K", 1)
+    return [KIND_LETTERS.index(char) * 2 for char in name[:split]] +\
+           [KIND_LETTERS.index(char) * 2 + 1 for char in name[split:]]
+
+
+# Tables that can never be won, there aren't enough pieces left to checkmate with
+def is_insufficient(name):
+    return name in ("KK", "KNK", "KBK")
+
+
+# The perfect index of a table. Every arrangement of the pieces (in table order) and side to move gets its own index.
+# Mirroring the board left to right changes nothing without castling, so the white king is always put on files a-d,
+# which halves the size of the table: 2 * 32 * 64^(n - 1) entries for n pieces.
+def table_size(count):
+    return 2 * 32 * 64 ** (count - 1)
+
+
+# Table name and index of a list of (piece type, square) pairs with the given side to move
+def table_index(pieces, side):
+    name, flip = table_name([p_type for p_type, _ in pieces])
+    if flip:
+        pieces = [(p_type ^ 1, sq ^ 56) for p_type, sq in pieces]
+        side ^= 1
+    squares = []
+    remaining = pieces[:]
+    for p_type in table_types(name):
+        for piece in remaining:
+            if piece[0] == p_type:
+                squares.append(piece[1])
+                remaining.remove(piece)
+                break
+    return name, encode(squares, side)
+
+
+def encode(squares, side):
+    if squares[0] & 7 >= 4: squares = [sq ^ 7 for sq in squares]
+    idx = side * 32 + (squares[0] >> 3) * 4 + (squares[0] & 7)
+    for sq in squares[1:]:
+        idx = idx * 64 + sq
+    return idx
+
+
+def decode(idx, count):
+    squares = [0] * count
+    for i in range(count - 1, 0, -1):
+        squares[i] = idx & 63
+        idx >>= 6
+    king = idx & 31
+    squares[0] = (king >> 2) * 8 + (king & 3)
+    return squares, idx >> 5
+
+
+def _attacked(sq, by, types, squares, occ, skip=None):
+    for i, p_type in enumerate(types):
+        if i == skip or p_type & 1 != by: continue
+        kind = p_type >> 1
+        frm = squares[i]
+        if kind == KING: attacks = KING_ATTACKS[frm]
+        elif kind == KNIGHT: attacks = KNIGHT_ATTACKS[frm]
+        elif kind == PAWN: attacks = PAWN_ATTACKS[by][frm]
+        elif kind == BISHOP: attacks = bishop_attacks(frm, occ)
+        elif kind == ROOK: attacks = rook_attacks(frm, occ)
+        else: attacks = queen_attacks(frm, occ)
+        if attacks >> sq & 1: return True
+    return False
+
+
+def _valid(types, squares, side):
+    occ = 0
+    for p_type, sq in zip(types, squares):
+        if occ >> sq & 1: return False
+        if p_type >> 1 == PAWN and not 8 <= sq < 56: return False
+        occ |= 1 << sq
+    king = squares[types.index(KING * 2 + (side ^ 1))]
+    return not _attacked(king, side, types, squares, occ)
+
+
+# Legal moves of the side to move as (piece index, to square, index of the captured piece or None, promotion kind)
+def _moves(types, squares, side):
+    occ = 0
+    own = 0
+    for p_type, sq in zip(types, squares):
+        occ |= 1 << sq
+        if p_type & 1 == side: own |= 1 << sq
+    king = types.index(KING * 2 + side)
+    for i, p_type in enumerate(types):
+        if p_type & 1 != side: continue
+        kind = p_type >> 1
+        frm = squares[i]
+        if kind == KING: targets = KING_ATTACKS[frm] & ~own
+        elif kind == KNIGHT: targets = KNIGHT_ATTACKS[frm] & ~own
+        elif kind == BISHOP: targets = bishop_attacks(frm, occ) & ~own
+        elif kind == ROOK: targets = rook_attacks(frm, occ) & ~own
+        elif kind == QUEEN: targets = queen_attacks(frm, occ) & ~own
+        else:
+            step = 8 if side == WHITE else -8
+            targets = PAWN_ATTACKS[side][frm] & occ & ~own
+            if not occ >> (frm + step) & 1:
+                targets |= 1 << (frm + step)
+                if frm >> 3 == (1 if side == WHITE else 6) and not occ >> (frm + 2 * step) & 1:
+                    targets |= 1 << (frm + 2 * step)
+        for to in squares_of(targets):
+            captured = squares.index(to) if occ >> to & 1 else None
+            new = squares[:]
+            new[i] = to
+            new_occ = occ & ~(1 << frm) | 1 << to
+            king_sq = to if i == king else squares[king]
+            if _attacked(king_sq, side ^ 1, types, new, new_occ, captured): continue
+            if kind == PAWN and (to >> 3 == 7 or to >> 3 == 0):
+                for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    yield i, to, captured, promo
+            else:
+                yield i, to, captured, 0
+
+
+# Positions that lead to this one with a single move of the side that just moved, as canonical indices. Captures and
+# promotions lead into other tables, so only plain moves have to be taken back.
+def _predecessors(types, squares, side):
+    mover = side ^ 1
+    occ = 0
+    for sq in squares:
+        occ |= 1 << sq
+    for i, p_type in enumerate(types):
+        if p_type & 1 != mover: continue
+        kind = p_type >> 1
+        to = squares[i]
+        if kind == KING: sources = KING_ATTACKS[to] & ~occ
+        elif kind == KNIGHT: sources = KNIGHT_ATTACKS[to] & ~occ
+        elif kind == BISHOP: sources = bishop_attacks(to, occ) & ~occ
+        elif kind == ROOK: sources = rook_attacks(to, occ) & ~occ
+        elif kind == QUEEN: sources = queen_attacks(to, occ) & ~occ
+        else:
+            step = -8 if mover == WHITE else 8
+            sources = 0
+            if not occ >> (to + step) & 1 and 8 <= to + step < 56:
+                sources = 1 << (to + step)
+                if to >> 3 == (3 if mover == WHITE else 4) and not occ >> (to + 2 * step) & 1:
+                    sources |= 1 << (to + 2 * step)
+        for frm in squares_of(sources):
+            new = squares[:]
+            new[i] = frm
+            if _valid(types, new, mover): yield encode(new, mover)
+
+
+# A table held in memory while tables are being generated
+class _MemoryTable:
+    def __init__(self, wdl, dtm):
+        self.wdl = wdl
+        self.dtm = dtm
+
+    def get(self, idx):
+        return self.wdl[idx], self.dtm[idx]
+
+
+# A table read from disk. Both files are memory-mapped, so opening a table doesn't read it.
+class _FileTable:
+    def __init__(self, path):
+        self._files = [open(path + ".wdl", "rb"), open(path + ".dtm", "rb")]
+        self._wdl, self._dtm = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) for f in self._files]
+
+    def get(self, idx):
+        return self._wdl[idx >> 2] >> (idx & 3) * 2 & 3, self._dtm[idx]
+
+    def close(self):
+        self._wdl.close()
+        self._dtm.close()
+        for f in self._files:
+            f.close()
+
+
+# Loads tables from a directory on first use and answers questions about positions with few enough pieces
+class Tablebase:
+    def __init__(self, directory=TABLE_DIR):
+        self.directory = directory
+        self._tables = {}
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".wdl"): self.max_pieces = max(self.max_pieces, len(name) - 4)
+
+    def _table(self, name):
+        if name not in self._tables:
+            path = os.path.join(self.directory, name)
+            self._tables[name] = _FileTable(path) if os.path.exists(path + ".wdl") else None
+        return self._tables[name]
+
+    # Looks up a list of (piece type, square) pairs with the given side to move. Returns (result, plies to mate) for
+    # the side to move, or None if there's no table for the material.
+    def lookup(self, pieces, side):
+        name, idx = table_index(pieces, side)
+        if is_insufficient(name): return DRAW, 0
+        table = self._table(name)
+        if table is None: return None
+        return table.get(idx)
+
+    # Exact result of the position as (result, plies to mate) for the side to move, or None if it isn't covered
+    def probe(self, pos):
+        if pos.castling or pos.ep is not None: return None
+        occ = pos.all_occupied()
+        if popcount(occ) > self.max_pieces: return None
+        return self.lookup([(pos.squares[sq], sq) for sq in squares_of(occ)], pos.side)
+
+    # The move that wins fastest, loses slowest or keeps the draw, None if the position isn't covered
+    def best_move(self, pos):
+        if self.probe(pos) is None: return None
+        best = None
+        best_key = None
+        for move in pos.legal_moves():
+            pos.make_move(move)
+            result = self.probe(pos)
+            pos.unmake_move()
+            if result is None: return None
+            wdl, dtm = result
+            # The opponent's result after the move, so a loss for them is what we're after
+            key = (2, -dtm) if wdl == LOSS else (1, 0) if wdl == DRAW else (0, dtm)
+            if best_key is None or key > best_key:
+                best = move
+                best_key = key
+        return best
+
+
+# Solves a table by retrograde analysis. First every position is generated once to count its moves that stay inside
+# the table and to look up the moves that capture or promote, which lead into smaller tables that are already solved.
+# Then, starting from the checkmates, results are spread backwards one ply at a time: every position that can move
+# into a loss is a win, and a position whose moves all lead into wins is a loss once the last of them is known.
+# Whatever is left at the end is a draw. lookup answers for the smaller tables like Tablebase.lookup does.
+def generate(name, lookup):
+    types = table_types(name)
+    count = len(types)
+    size = table_size(count)
+    wdl = bytearray(size)
+    dtm = bytearray(size)
+    done = bytearray(size)
+    remaining = array("H", bytes(2 * size))
+    exits = {} # Best result among the capturing and promoting moves, for the side to move
+    buckets = {} # Plies -> positions whose result becomes known then because of their exits
+    frontier = []
+
+    for idx in range(size):
+        squares, side = decode(idx, count)
+        if not _valid(types, squares, side): continue
+        wdl[idx] = DRAW
+        has_moves = False
+        best = None
+        for i, to, captured, promo in _moves(types, squares, side):
+            has_moves = True
+            if captured is None and not promo:
+                remaining[idx] += 1
+                continue
+            pieces = [(types[j] if j != i or not promo else promo * 2 + side, to if j == i else squares[j])
+                      for j in range(count) if j != captured]
+            result, plies = lookup(pieces, side ^ 1)
+            key = (2, -plies - 1, WIN) if result == LOSS else (1, 0, DRAW) if result == DRAW else (0, plies + 1, LOSS)
+            if best is None or key > best: best = key
+        if not has_moves:
+            done[idx] = 1
+            if _attacked(squares[types.index(KING * 2 + side)], side ^ 1, types, squares, sum(1 << sq for sq in squares)):
+                wdl[idx] = LOSS
+                frontier.append(idx)
+            continue
+        if best is None: continue
+        exits[idx] = (best[2], abs(best[1]))
+        if best[2] == WIN or remaining[idx] == 0 and best[2] == LOSS:
+            buckets.setdefault(abs(best[1]), []).append((idx, best[2]))
+        elif remaining[idx] == 0:
+            done[idx] = 1
+
+    plies = 0
+    while frontier or buckets:
+        for idx, result in buckets.pop(plies, []):
+            if done[idx]: continue
+            done[idx] = 1
+            wdl[idx] = result
+            dtm[idx] = plies
+            frontier.append(idx)
+        next_frontier = []
+        for idx in frontier:
+            squares, side = decode(idx, count)
+            for prev in _predecessors(types, squares, side):
+                if done[prev]: continue
+                if wdl[idx] == LOSS:
+                    result = WIN
+                else:
+                    remaining[prev] -= 1
+                    if remaining[prev]: continue
+                    best = exits.get(prev)
+                    if best is not None and best[0] != LOSS:
+                        if best[0] == DRAW: done[prev] = 1
+                        continue
+                    if best is not None and best[1] > plies + 1:
+                        buckets.setdefault(best[1], []).append((prev, LOSS))
+                        continue
+                    result = LOSS
+                done[prev] = 1
+                wdl[prev] = result
+                dtm[prev] = min(plies + 1, 255)
+                next_frontier.append(prev)
+        frontier = next_frontier
+        plies += 1
+    return _MemoryTable(wdl, dtm)
+
+
+# Writes a solved table to the directory in the format _FileTable reads
+def write_table(directory, name, table):
+    packed = bytearray((len(table.wdl) + 3) // 4)
+    for idx, result in enumerate(table.wdl):
+        packed[idx >> 2] |= result << (idx & 3) * 2
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, name + ".wdl"), "wb") as f:
+        f.write(packed)
+    with open(os.path.join(directory, name + ".dtm"), "wb") as f:
+        f.write(table.dtm)
+
+
+# Generates the named tables along with every smaller table they lead into that isn't on disk yet
+def build(names, directory=TABLE_DIR):
+    tablebase = Tablebase(directory)
+    solved = {}
+
+    def lookup(pieces, side):
+        name, idx = table_index(pieces, side)
+        if is_insufficient(name): return DRAW, 0
+        if name not in solved and not os.path.exists(os.path.join(directory, name + ".wdl")): solve(name)
+        if name in solved: return solved[name].get(idx)
+        return tablebase.lookup(pieces, side)
+
+    def solve(name):
+        start = time.time()
+        solved[name] = generate(name, lookup)
+        write_table(directory, name, solved[name])
+        wins = solved[name].wdl.count(WIN)
+        print(f"{name}: {wins} wins, {solved[name].wdl.count(LOSS)} losses, {solved[name].wdl.count(DRAW)} draws, "
+              f"longest mate {max(solved[name].dtm)} plies, {time.time() - start:.1f}s")
+
+    for name in names:
+        name, _ = table_name(table_types(name))
+        if len(name) > MAX_PIECES: raise ValueError(f"Tables have at most {MAX_PIECES} pieces: {name}")
+        if name not in solved: solve(name)
+
+
+# Here is how to generate the tablebases through the terminal:
+# --> python3 tablebase.py <(~optional) tables> <--
+# Tables are named after their pieces with the stronger side first, such as KQK or KRKP. The tables the named ones lead
+# into after a capture or promotion are generated too. Without any names, KQK, KRK and KPK are generated. Three piece
+# tables take seconds, four piece tables take a long while in pure Python.
+if __name__ == '__main__':
+    build(sys.argv[1:] or DEFAULT_TABLES)
@@ -0,0 +1,29 @@
+import unittest
+from bitboard import Position
+from notation import to_san
+from search import Search, MATE, MAX_PLY
+
+# Depth the selective search has to find the mates below by, with every technique on as the game uses it
+DEFAULT_DEPTH = 5
+
+
+# Mates the selective search (null-move pruning, late move reductions, futility pruning and razoring) must not hide.
+# --> python3 -m unittest test_search <--
+class MateTest(unittest.TestCase):
+    def assert_mate(self, fen, first_move, depth=DEFAULT_DEPTH):
+        search = Search()
+        pos = Position.from_fen(fen)
+        move = search.iterate(pos, depth)
+        self.assertEqual(to_san(pos, move).rstrip("+#"), first_move)
+        self.assertGreaterEqual(search.score, MATE - MAX_PLY)
+
+    # Mate in 2 by a quiet rook sacrifice in a zugzwang, which null moves and razoring both used to miss
+    def test_zugzwang_mate_in_2(self):
+        self.assert_mate("kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1", "Ra6")
+
+    def test_back_rank_mate_in_1(self):
+        self.assert_mate("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", "Rd8")
+
+
+if __name__ == '__main__':
+    unittest.main()
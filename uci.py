@@ -0,0 +1,151 @@
+import os
+import sys
+import threading
+from bitboard import *
+from book import OpeningBook
+from notation import to_uci, parse_uci
+from search import Search, MATE, MAX_PLY
+from tablebase import Tablebase, TABLE_DIR
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+MOVES_TO_GO = 30 # Moves the rest of the game is assumed to last when the GUI doesn't say
+TIME_MARGIN = 50 # Milliseconds kept back on every move for the GUI and the operating system
+
+
+# Score of the search in the units UCI expects: centipawns, where eval_board's pawn is worth 10, or moves to mate
+def uci_score(score):
+    if abs(score) >= MATE - MAX_PLY:
+        plies = MATE - abs(score)
+        return f"mate {int(plies + 1) // 2 if score > 0 else -(int(plies + 1) // 2)}"
+    return f"cp {int(round(score * 10))}"
+
+
+# Thinking time for one move out of the time left on the clock, in milliseconds
+def allocate_time(time_left, increment, moves_to_go):
+    movetime = time_left / (moves_to_go or MOVES_TO_GO) + increment * 0.8
+    return max(1, int(min(movetime, time_left / 2) - TIME_MARGIN))
+
+
+# The engine as a UCI engine, reading commands from stdin and writing answers to stdout, so it can be run by
+# tournament managers and chess GUIs without pygame. The search runs on a background thread, which leaves the main
+# thread free to answer isready and stop straight away.
+class UCIEngine:
+    def __init__(self, out=sys.stdout):
+        self._out = out
+        self._print_lock = threading.Lock()
+        self._tablebase = Tablebase(TABLE_DIR) if os.path.isdir(TABLE_DIR) else None
+        self._search = Search(tablebase=self._tablebase)
+        self._search.stop_event = threading.Event()
+        self._book_path = "Books/book.bin"
+        self._book = OpeningBook(self._book_path) if os.path.exists(self._book_path) else None
+        self._use_book = True
+        self._thread = None
+        self._infinite = False
+        self.position = Position.from_fen(START_FEN)
+
+    # Lines sent together are written under the same lock, so no other thread's output can come between them
+    def send(self, *lines):
+        with self._print_lock:
+            for line in lines:
+                self._out.write(line + "\n")
+            self._out.flush()
+
+    # Handles one command, returns False once the engine should quit
+    def command(self, line):
+        tokens = line.split()
+        if not tokens: return True
+        name = tokens[0]
+        if name == "uci":
+            self.send("id name Cheap Chess, Deep Chess")
+            self.send(f"option name OwnBook type check default {'true' if self._book is not None else 'false'}")
+            self.send("uciok")
+        elif name == "isready":
+            self.send("readyok")
+        elif name == "setoption":
+            self.set_option(tokens)
+        elif name == "ucinewgame":
+            self.wait()
+            self._search.tt.clear()
+        elif name == "position":
+            self.wait()
+            self.set_position(tokens[1:])
+        elif name == "go":
+            self.wait()
+            self.go(tokens[1:])
+        elif name == "stop":
+            self.stop()
+        elif name == "quit":
+            self.stop()
+            return False
+        return True
+
+    def set_option(self, tokens):
+        if "name" not in tokens or "value" not in tokens: return
+        option = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = " ".join(tokens[tokens.index("value") + 1:])
+        if option == "ownbook": self._use_book = value.lower() == "true"
+
+    # position [startpos | fen <fen>] [moves <move> ...]
+    def set_position(self, tokens):
+        moves = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if tokens and tokens[0] == "fen": self.position = Position.from_fen(" ".join(tokens[1:moves]))
+        else: self.position = Position.from_fen(START_FEN)
+        for text in tokens[moves + 1:]:
+            move = parse_uci(self.position, text)
+            if move is None: break
+            self.position.make_move(move)
+
+    # go [depth N] [movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS] [movestogo N] [nodes N] [infinite]
+    def go(self, tokens):
+        limits = {}
+        for idx, token in enumerate(tokens[:-1]):
+            if tokens[idx + 1].lstrip("-").isdigit(): limits[token] = int(tokens[idx + 1])
+        self._infinite = "infinite" in tokens
+        depth = limits.get("depth", MAX_PLY)
+        nodes = limits.get("nodes")
+        movetime = limits.get("movetime")
+        clock = "wtime" if self.position.side == WHITE else "btime"
+        if movetime is None and clock in limits:
+            increment = limits.get("winc" if self.position.side == WHITE else "binc", 0)
+            movetime = allocate_time(limits[clock], increment, limits.get("movestogo"))
+        self._search.stop_event.clear()
+        pos = self.position.copy()
+        self._thread = threading.Thread(target=self._think, args=(pos, depth, movetime, nodes), daemon=True)
+        self._thread.start()
+
+    def _think(self, pos, depth, movetime, nodes):
+        move = None
+        if self._use_book and self._book is not None and not self._infinite: move = self._book.choose(pos)
+        if move is None:
+            move = self._search.iterate(pos, depth, movetime, nodes, lambda *info: self._info(pos, *info))
+        # In infinite mode the best move must only be sent once the GUI says stop
+        if self._infinite: self._search.stop_event.wait()
+        self.send(f"bestmove {to_uci(move) if move is not None else '0000'}")
+
+    def _info(self, pos, depth, score, move, nodes, seconds):
+        pv = self._search.principal_variation(pos)
+        if not pv or pv[0] != move: pv = [move]
+        # nodes counts quiescence nodes too, as UCI expects, so they and the move ordering get a line of their own
+        self.send(f"info depth {depth} score {uci_score(score)} nodes {nodes} nps {int(nodes / max(seconds, 1e-6))} "
+                  f"time {int(seconds * 1000)} hashfull {self._search.tt.hashfull()} "
+                  f"pv {' '.join(to_uci(pv_move) for pv_move in pv)}",
+                  f"info string qnodes {self._search.qnodes} firstcutoff {self._search.first_cutoff_rate():.2f}")
+
+    def stop(self):
+        self._search.stop_event.set()
+        self.wait()
+
+    # Waits for the search thread to finish, a new command that needs the engine can't start before that
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# Here is how to run the engine in UCI mode, which is how chess GUIs and tournament managers talk to engines:
+# --> python3 uci.py <--
+if __name__ == '__main__':
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.command(line.strip()): break
+    engine.stop()